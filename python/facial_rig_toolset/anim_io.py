@@ -0,0 +1,66 @@
+import numpy as np
+
+import maya.cmds as mc
+
+
+# the keyTangent in and out tangent types, the in tangent doesn't matter before a stepped key
+TANGENT_TYPES = {
+    "linear": ("linear", "linear"),
+    "flat": ("flat", "flat"),
+    "step": ("linear", "step"),
+    "spline": ("spline", "spline"),
+}
+
+ANIM_CURVE_TYPES = {
+    "doubleLinear": "animCurveTL",
+    "doubleAngle": "animCurveTA",
+    "time": "animCurveTT",
+}
+
+
+def set_keys(node, attr, times, values, tangent="linear"):
+    '''
+    key all the frames of one attribute with a single setAttr on the anim curve keys (.ktv)
+    everything goes through undoable commands: the old curve is deleted, the new one is created,
+    keyed, its tangents set and connected, in one undo chunk
+    the current time doesn't change
+    returns the anim curve
+    '''
+    times = np.asarray(times, dtype=np.float64).ravel()
+    values = np.asarray(values, dtype=np.float64).ravel()
+
+    if len(times) != len(values):
+        raise ValueError(f"{len(times)} frames don't match {len(values)} values")
+
+    plug = f"{node}.{attr}"
+    curve_type = ANIM_CURVE_TYPES.get(mc.getAttr(plug, type=True), "animCurveTU")
+    in_tangent, out_tangent = TANGENT_TYPES[tangent]
+
+    mc.undoInfo(openChunk=True, chunkName="set_keys")
+    try:
+        old_curves = mc.listConnections(plug, source=True, destination=False, type="animCurve")
+        if old_curves:
+            mc.delete(old_curves)
+
+        anim_curve = mc.createNode(curve_type, name=f"{node}_{attr}")
+        if len(times):
+            # the times are in the ui time unit, the values in the ui unit of the attribute
+            mc.setAttr(f"{anim_curve}.ktv[0:{len(times) - 1}]", *np.column_stack([times, values]).ravel().tolist(), size=len(times))
+            mc.keyTangent(anim_curve, inTangentType=in_tangent, outTangentType=out_tangent)
+        mc.connectAttr(f"{anim_curve}.output", plug, force=True)
+    finally:
+        mc.undoInfo(closeChunk=True)
+
+    return anim_curve
+
+
+def set_translate_keys(node, times, translations, tangent="linear"):
+    '''
+    (n, 3) translations keyed on tx, ty and tz, one call per channel
+    '''
+    translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+
+    return [
+        set_keys(node, attr, times, translations[:, axis], tangent)
+        for axis, attr in enumerate(("translateX", "translateY", "translateZ"))
+    ]
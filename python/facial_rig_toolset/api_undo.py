@@ -0,0 +1,32 @@
+import os
+
+import maya.cmds as mc
+
+
+PLUGIN_NAME = "frt_api_undo"
+PLUGIN_PATH = os.path.join(os.path.dirname(__file__), "plugins", f"{PLUGIN_NAME}.py")
+COMMAND = "frtApiUndo"
+
+_pending = []
+
+
+def _load_plugin():
+    if not mc.pluginInfo(PLUGIN_NAME, q=True, loaded=True):
+        mc.loadPlugin(PLUGIN_PATH, quiet=True)
+
+
+def take_pending():
+    '''
+    the (undo, redo) functions handed to the last frtApiUndo call
+    '''
+    return _pending.pop()
+
+
+def commit(undo, redo):
+    '''
+    put an API edit that is already done on the undo queue
+    undo puts the old state back, redo does the edit again
+    '''
+    _load_plugin()
+    _pending.append((undo, redo))
+    getattr(mc, COMMAND)()
@@ -1,7 +1,16 @@
 from genericpath import exists
+from importlib import reload
+
+import numpy as np
+
 import maya.cmds as mc
 from maya import OpenMaya as om
 
+from facial_rig_toolset import head_cut
+from facial_rig_toolset import skin_io
+reload(head_cut)
+reload(skin_io)
+
 HEAD_JNT = "_head_jnt"
 BODY_GEOMETRY = "body_geo"
 HEAD_GEOMETRY = "head_geo"
@@ -37,6 +46,8 @@ def connect_the_head_and_the_body():
         create blend shape between the head and body
         set the blen shape to 1
         hide the head_geo 
+        the blend shape pairs the head vertex i with the body vertex i,
+        the body vertex ids recorded at the head cut are checked to follow that order
     '''
     selected_joints = mc.ls(selection=True)
 
@@ -44,6 +55,14 @@ def connect_the_head_and_the_body():
         om.MGlobal.displayError("Please select the joints you'd like to connect, first the body joints then the head joints.")
         return
 
+    vertex_map = head_cut.get_body_vertex_map(HEAD_GEOMETRY, BODY_GEOMETRY)
+    if vertex_map is None:
+        om.MGlobal.displayWarning(f"No vertex map of '{HEAD_GEOMETRY}' matching '{BODY_GEOMETRY}', the blend shape vertex order isn't checked.")
+    elif not np.array_equal(vertex_map, np.arange(len(vertex_map))):
+        mismatched = int((vertex_map != np.arange(len(vertex_map))).sum())
+        om.MGlobal.displayError(f"{mismatched} vertices of '{HEAD_GEOMETRY}' don't have the id of their '{BODY_GEOMETRY}' vertex, the blend shape would move the wrong vertices.")
+        return
+
     body_joints = selected_joints[:int(len(selected_joints)/2)]
     head_joints = selected_joints[int(len(selected_joints)/2):]
 
@@ -56,14 +75,43 @@ def connect_the_head_and_the_body():
     mc.hide(HEAD_GEOMETRY)
     
 
-def _transfer_weights_from_body_to_head():
+def _get_max_influences(skin_cluster):
+    '''
+        the max influences of the skin cluster if it maintains them, None otherwise
+    '''
+    if not mc.skinCluster(skin_cluster, q=True, maintainMaxInfluences=True):
+        return None
+
+    return mc.skinCluster(skin_cluster, q=True, maximumInfluences=True)
+
+
+def _transfer_weights_from_body_to_head(bulk=True, vertex_ids=None, max_distance=None, max_influences=None):
     '''
         copy body skin weights to the shared part of the head skin cluster 
+        bulk reads and writes the whole weight matrices at once, the joints are matched by label
+        and the head vertices by the body vertex ids recorded at the head cut,
+        by the closest body vertex if the topology changed since, vertex_ids limits the head vertices
+        the weights are kept sparse, max_influences limits the influences per vertex,
+        by default the head skin cluster limit if it maintains max influences, 0 doesn't limit them
+        bulk=False uses copySkinWeights
     ''' 
 
     if not _object_exists(SKIN_CLUSTER_BODY):
         return 
 
+    if bulk:
+        if max_influences is None:
+            max_influences = _get_max_influences(SKIN_CLUSTER_HEAD)
+
+        vertex_map = head_cut.get_body_vertex_map(HEAD_GEOMETRY, BODY_GEOMETRY)
+        if vertex_map is None:
+            om.MGlobal.displayWarning(f"No vertex map of '{HEAD_GEOMETRY}' matching '{BODY_GEOMETRY}', the vertices are matched by position.")
+
+        return skin_io.transfer_skin_weights(
+            BODY_GEOMETRY, SKIN_CLUSTER_BODY, HEAD_GEOMETRY, SKIN_CLUSTER_HEAD,
+            vertex_ids, max_distance, max_influences, vertex_map=vertex_map
+        )
+
     mc.copySkinWeights(ss=SKIN_CLUSTER_BODY, ds=SKIN_CLUSTER_HEAD, noMirror=True, ia="label")
     
       
@@ -0,0 +1,225 @@
+import numpy as np
+
+from facial_rig_toolset import spatial
+
+
+BRUTE_FORCE_CHUNK = 2000000
+GRID_GROWTH = 2.0
+
+
+def triangulate(face_vertex_counts):
+    '''
+    fan triangles of every face as (m, 3) face-vertex positions and the face id of every triangle
+    index face_vertex_indices (or the face-vertex uv ids) with them to get the corners
+    '''
+    face_vertex_counts = np.asarray(face_vertex_counts, dtype=np.int64)
+    face_starts = np.cumsum(face_vertex_counts) - face_vertex_counts
+
+    triangle_counts = np.maximum(face_vertex_counts - 2, 0)
+    face_ids = np.repeat(np.arange(len(face_vertex_counts)), triangle_counts)
+    fan_steps = np.arange(triangle_counts.sum()) - np.repeat(np.cumsum(triangle_counts) - triangle_counts, triangle_counts)
+
+    starts = face_starts[face_ids]
+    triangles = np.column_stack([starts, starts + fan_steps + 1, starts + fan_steps + 2])
+
+    return triangles, face_ids
+
+
+def get_face_vertex_uv_ids(face_vertex_counts, uv_counts, uv_ids):
+    '''
+    uv id of every face-vertex, -1 on the faces without uvs that getAssignedUVs skips
+    '''
+    mapped = np.repeat(np.asarray(uv_counts) > 0, face_vertex_counts)
+
+    face_vertex_uv_ids = np.full(len(mapped), -1, dtype=np.int64)
+    face_vertex_uv_ids[mapped] = uv_ids
+
+    return face_vertex_uv_ids
+
+
+def _dot(a, b):
+    return np.einsum('ij,ij->i', a, b)
+
+
+def closest_points_on_triangles(points, a, b, c):
+    '''
+    closest point of every triangle (a, b, c) to its point, all arrays are (n, 3)
+    the Voronoi region test from Real-Time Collision Detection done for every pair at once
+    returns the closest points and their (n, 3) barycentric coordinates
+    '''
+    ab = b - a
+    ac = c - a
+    ap = points - a
+    bp = points - b
+    cp = points - c
+
+    d1 = _dot(ab, ap)
+    d2 = _dot(ac, ap)
+    d3 = _dot(ab, bp)
+    d4 = _dot(ac, bp)
+    d5 = _dot(ab, cp)
+    d6 = _dot(ac, cp)
+
+    va = d3 * d6 - d5 * d4
+    vb = d5 * d2 - d1 * d6
+    vc = d1 * d4 - d3 * d2
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # inside the face
+        denominator = va + vb + vc
+        v = np.where(denominator != 0, vb / denominator, 0.0)
+        w = np.where(denominator != 0, vc / denominator, 0.0)
+        barycentric = np.column_stack([1.0 - v - w, v, w])
+
+        # the regions are applied in reverse order so the earlier tests win
+        on_bc = (va <= 0) & (d4 - d3 >= 0) & (d5 - d6 >= 0)
+        w_bc = (d4 - d3) / ((d4 - d3) + (d5 - d6))
+        barycentric[on_bc] = np.column_stack([np.zeros(on_bc.sum()), 1.0 - w_bc[on_bc], w_bc[on_bc]])
+
+        on_ac = (vb <= 0) & (d2 >= 0) & (d6 <= 0)
+        w_ac = d2 / (d2 - d6)
+        barycentric[on_ac] = np.column_stack([1.0 - w_ac[on_ac], np.zeros(on_ac.sum()), w_ac[on_ac]])
+
+        barycentric[(d6 >= 0) & (d5 <= d6)] = [0.0, 0.0, 1.0]
+
+        on_ab = (vc <= 0) & (d1 >= 0) & (d3 <= 0)
+        v_ab = d1 / (d1 - d3)
+        barycentric[on_ab] = np.column_stack([1.0 - v_ab[on_ab], v_ab[on_ab], np.zeros(on_ab.sum())])
+
+        barycentric[(d3 >= 0) & (d4 <= d3)] = [0.0, 1.0, 0.0]
+        barycentric[(d1 <= 0) & (d2 <= 0)] = [1.0, 0.0, 0.0]
+
+    closest = barycentric[:, :1] * a + barycentric[:, 1:2] * b + barycentric[:, 2:] * c
+
+    return closest, barycentric
+
+
+class TriangleIndex(object):
+    '''
+    closest point queries on a triangulated mesh
+    the triangle centres are bucketed in spatial grids, the finest one has the cell size of the largest triangle
+    and every next one is GRID_GROWTH times coarser, a query only tests the triangles around its nearest centre
+    in the finest grid that can hold the search, the rest test every triangle in chunks
+    '''
+
+    def __init__(self, points, face_vertex_counts, face_vertex_indices, uvs=None, face_vertex_uv_ids=None):
+
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+        triangles, self.face_ids = triangulate(face_vertex_counts)
+        self.triangles = np.asarray(face_vertex_indices, dtype=np.int64)[triangles]
+
+        self.uvs = None
+        if uvs is not None and face_vertex_uv_ids is not None:
+            self.uvs = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)
+            self.triangle_uv_ids = np.asarray(face_vertex_uv_ids, dtype=np.int64)[triangles]
+
+        corners = self.points[self.triangles]
+        self.centres = corners.mean(axis=1)
+        self.max_radius = float(np.linalg.norm(corners - self.centres[:, None], axis=2).max()) if len(corners) else 0.0
+
+        size = float(np.ptp(self.points, axis=0).max()) if len(self.points) else 0.0
+        self._max_cell_size = max(size, 1e-6)
+        self._grids = []
+
+    def _get_grid(self, level):
+        '''
+        the grid of the level, built the first time it is needed
+        '''
+        while len(self._grids) <= level:
+            cell_size = max(2.0 * self.max_radius, 1e-6) * GRID_GROWTH ** len(self._grids)
+            self._grids.append(spatial.SpatialGrid(self.centres, cell_size))
+
+        return self._grids[level]
+
+    def __len__(self):
+        return len(self.triangles)
+
+    def _closest_on(self, query_ids, triangle_ids, queries):
+        '''
+        the closest triangle of every query among its candidate pairs
+        '''
+        a, b, c = (self.points[self.triangles[triangle_ids, corner]] for corner in range(3))
+        closest, barycentric = closest_points_on_triangles(queries[query_ids], a, b, c)
+        distances = np.linalg.norm(closest - queries[query_ids], axis=1)
+
+        order = np.lexsort((distances, query_ids))
+        first = order[np.r_[True, query_ids[order][1:] != query_ids[order][:-1]]]
+
+        return query_ids[first], triangle_ids[first], closest[first], barycentric[first], distances[first]
+
+    def closest(self, queries):
+        '''
+        closest surface point of every query
+        returns (n, 3) points, triangle ids, (n, 3) barycentric coordinates and distances
+        '''
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+
+        closest = np.zeros((len(queries), 3))
+        triangle_ids = np.full(len(queries), -1, dtype=np.int64)
+        barycentric = np.zeros((len(queries), 3))
+        distances = np.full(len(queries), np.inf)
+
+        def store(result):
+            ids, triangles, points, weights, lengths = result
+            closest[ids] = points
+            triangle_ids[ids] = triangles
+            barycentric[ids] = weights
+            distances[ids] = lengths
+
+        # the nearest centre is on its triangle, so the closest triangle has its centre
+        # within that distance plus the largest triangle radius
+        remaining = np.arange(len(queries))
+        level = 0
+
+        while len(remaining) and len(self.triangles):
+            grid = self._get_grid(level)
+            if grid.cell_size > self._max_cell_size * GRID_GROWTH:
+                break
+
+            remaining_queries = queries[remaining]
+            _, nearest_distances = grid.nearest(remaining_queries)
+            search_radius = nearest_distances + self.max_radius
+            in_grid = search_radius <= grid.cell_size
+
+            if in_grid.any():
+                query_ids, candidate_ids, centre_distances = grid.query_pairs(remaining_queries[in_grid])
+                keep = centre_distances <= search_radius[in_grid][query_ids]
+                result = self._closest_on(query_ids[keep], candidate_ids[keep], remaining_queries[in_grid])
+                store((remaining[in_grid][result[0]],) + result[1:])
+
+            remaining = remaining[~in_grid]
+            level += 1
+
+        chunk = max(1, BRUTE_FORCE_CHUNK // max(len(self.triangles), 1))
+
+        for start in range(0, len(remaining), chunk):
+            chunk_ids = remaining[start:start + chunk]
+            query_ids = np.repeat(chunk_ids, len(self.triangles))
+            candidate_ids = np.tile(np.arange(len(self.triangles)), len(chunk_ids))
+            store(self._closest_on(query_ids, candidate_ids, queries))
+
+        return closest, triangle_ids, barycentric, distances
+
+    def get_uvs(self, triangle_ids, barycentric):
+        '''
+        interpolate the uvs of the triangle corners, nan where the triangle has no uvs
+        '''
+        if self.uvs is None:
+            raise ValueError("The triangle index was built without uvs")
+
+        uv_ids = self.triangle_uv_ids[triangle_ids]
+        corner_uvs = self.uvs[np.maximum(uv_ids, 0)]
+        uvs = np.einsum('ij,ijk->ik', barycentric, corner_uvs)
+        uvs[(uv_ids < 0).any(axis=1)] = np.nan
+
+        return uvs
+
+    def closest_uvs(self, queries):
+        '''
+        closest surface points of the queries and their uvs
+        returns (n, 3) points and (n, 2) uvs
+        '''
+        closest, triangle_ids, barycentric, _ = self.closest(queries)
+
+        return closest, self.get_uvs(triangle_ids, barycentric)
@@ -0,0 +1,78 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+CACHE_SIZE = 32
+
+
+def _as_key(shapes):
+    return tuple(sorted(set(shapes)))
+
+
+def get_combo_keys(primaries, combos):
+    '''
+    one sorted key per shape: (primary,) for the primaries and the sorted primaries of every combo
+    ordered by the combo size so every key comes after its subsets
+    '''
+    keys = [(primary,) for primary in primaries]
+
+    for combo in combos:
+        key = _as_key(combo)
+        if len(key) < 2:
+            raise ValueError(f"The combo {combo} needs at least 2 primary shapes")
+        missing = [shape for shape in key if (shape,) not in keys]
+        if missing:
+            raise ValueError(f"The combo {combo} uses unknown primary shapes {missing}")
+        keys.append(key)
+
+    if len(set(keys)) != len(keys):
+        raise ValueError("The primary shapes and the combos should be unique")
+
+    return sorted(keys, key=len)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def get_solver_matrix(keys):
+    '''
+    inverse of I + L, L[i, j] = 1 if the key j is a proper subset of the key i
+    row i holds the inclusion-exclusion signs turning the sculpted deltas into the correctives
+    cached per combo layout, it only depends on which shapes combine
+    '''
+    key_sets = [frozenset(key) for key in keys]
+    subsets = np.array([[other < key for other in key_sets] for key in key_sets], dtype=np.float64)
+
+    return np.linalg.inv(np.eye(len(keys)) + subsets)
+
+
+def solve_correctives(primary_deltas, combo_deltas):
+    '''
+    corrective deltas of the combos, the sculpted combo delta minus the correctives of all its subsets
+    primary_deltas: {primary: (n, 3) delta}
+    combo_deltas: {(primary, primary, ...): (n, 3) sculpted delta with all of them on}
+    returns {combo key: (n, 3) corrective}, the keys are the sorted primaries of the combo
+    '''
+    keys = get_combo_keys(list(primary_deltas), list(combo_deltas))
+
+    deltas = {(primary,): delta for primary, delta in primary_deltas.items()}
+    deltas.update({_as_key(combo): delta for combo, delta in combo_deltas.items()})
+
+    stacked = np.stack([np.asarray(deltas[key], dtype=np.float64).reshape(-1, 3) for key in keys])
+    correctives = np.tensordot(get_solver_matrix(tuple(keys)), stacked, axes=1)
+
+    return {key: corrective for key, corrective in zip(keys, correctives) if len(key) > 1}
+
+
+def solve_corrective_points(base, primary_points, combo_points):
+    '''
+    solve_correctives on the shape points instead of the deltas
+    returns {combo key: (n, 3) corrective shape points}
+    '''
+    base = np.asarray(base, dtype=np.float64).reshape(-1, 3)
+
+    correctives = solve_correctives(
+        {primary: np.asarray(points, dtype=np.float64).reshape(-1, 3) - base for primary, points in primary_points.items()},
+        {combo: np.asarray(points, dtype=np.float64).reshape(-1, 3) - base for combo, points in combo_points.items()}
+    )
+
+    return {key: base + corrective for key, corrective in correctives.items()}
@@ -0,0 +1,130 @@
+import numpy as np
+
+
+SUBTRACT = 0
+ADD = 1
+COPY = 2
+
+# abSMAddSubtractCopyMesh types -> (operation, mirror, offset from the target)
+MEL_OPERATION_TYPES = {
+    0: (SUBTRACT, False, False),
+    1: (ADD, False, False),
+    2: (COPY, False, False),
+    3: (SUBTRACT, True, False),
+    4: (ADD, True, False),
+    5: (COPY, True, False),
+    6: (SUBTRACT, False, True),
+    7: (COPY, False, True),
+    9: (SUBTRACT, True, True),
+    10: (ADD, True, True),
+}
+
+
+def _as_points(points):
+    return np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+
+def get_delta(base, source):
+    '''
+    offset of the source shape from the base shape
+    '''
+    return _as_points(source) - _as_points(base)
+
+
+def mirror_delta(delta, symmetry_map, axis=None):
+    '''
+    move every offset onto the mirrored vertex and reflect it
+    the vertices without a pair keep their own offset reflected
+    '''
+    delta = _as_points(delta)
+
+    if axis is None:
+        axis = symmetry_map.axis
+
+    vertex_ids = np.arange(len(delta))
+    gather = np.where(symmetry_map.mirror >= 0, symmetry_map.mirror, vertex_ids)
+
+    mirrored = delta[gather]
+    mirrored[:, axis] *= -1.0
+
+    return mirrored
+
+
+def apply_delta(base, source, target, operation, symmetry_map=None, offset_from_target=False):
+    '''
+    target ± (source - base) for the whole mesh at once
+    operation: 0 - subtract, 1 - add, 2 - copy
+    symmetry_map mirrors the offset before it is applied
+    offset_from_target uses the target instead of the base to measure the offset
+    returns the new target points
+    '''
+    target = _as_points(target)
+    base = target if offset_from_target else _as_points(base)
+    source = _as_points(source)
+
+    if not len(base) == len(source) == len(target):
+        raise ValueError(f"The meshes don't match: base {len(base)}, source {len(source)}, target {len(target)} vertices")
+
+    delta = get_delta(base, source)
+
+    if symmetry_map is not None:
+        delta = mirror_delta(delta, symmetry_map)
+
+    if operation == SUBTRACT:
+        return target - delta
+    if operation == ADD:
+        return target + delta
+    if operation == COPY:
+        return base + delta
+
+    raise ValueError(f"Unknown operation {operation}")
+
+
+def apply_mel_operation(base, source, target, operation_type, symmetry_map=None):
+    '''
+    apply_delta driven by the abSMAddSubtractCopyMesh type numbers (0 - 10)
+    '''
+    if operation_type not in MEL_OPERATION_TYPES:
+        raise ValueError(f"Unknown operation type {operation_type}")
+
+    operation, mirror, offset_from_target = MEL_OPERATION_TYPES[operation_type]
+
+    if mirror and symmetry_map is None:
+        raise ValueError(f"The operation type {operation_type} needs a symmetry map")
+
+    return apply_delta(
+        base,
+        source,
+        target,
+        operation,
+        symmetry_map=symmetry_map if mirror else None,
+        offset_from_target=offset_from_target
+    )
+
+
+def get_moved_vertices(base, shape, tolerance=0.001):
+    '''
+    abSelMovedVerts, vertices whose offset from the base is longer than the tolerance
+    returns the vertex ids and their offset lengths
+    '''
+    magnitudes = np.linalg.norm(get_delta(base, shape), axis=1)
+    moved = np.flatnonzero(magnitudes > tolerance)
+
+    return moved, magnitudes[moved]
+
+
+def get_cluster_pose_points(base, weights, translations):
+    '''
+    points deformed by a cluster that only translates, base + weight * translation
+    weights: per vertex cluster weights, translations: (poses, 3) offsets in the space of the base
+    returns (poses, n, 3)
+    '''
+    base = _as_points(base)
+    weights = np.asarray(weights, dtype=np.float64).ravel()
+    translations = np.asarray(translations, dtype=np.float64).reshape(-1, 3)
+
+    if len(weights) != len(base):
+        raise ValueError(f"{len(weights)} weights don't match {len(base)} vertices")
+
+    return base[None] + weights[None, :, None] * translations[:, None, :]
+
@@ -0,0 +1,116 @@
+from functools import lru_cache
+import time
+
+import numpy as np
+
+
+DEGREE = 3
+SAMPLE_COUNT = 21
+CACHE_SIZE = 128
+TIMING_RUNS = 100
+
+
+def parse_curve_string(curve_string):
+    '''
+    'x,y,x,y,...' from falloffCurve -q -asString into (n, 2) control points
+    '''
+    values = [float(value) for value in curve_string.split(',') if value.strip()]
+
+    return np.array(values[:len(values) // 2 * 2], dtype=np.float64).reshape(-1, 2)
+
+
+def get_knots(control_point_count, degree=DEGREE):
+    '''
+    clamped uniform knot vector, the same one the MEL evaluator built for the cubic case
+    '''
+    inner_knots = np.arange(1, control_point_count - degree, dtype=np.float64)
+    last_knot = control_point_count - degree
+
+    return np.concatenate([np.zeros(degree + 1), inner_knots, np.full(degree + 1, last_knot, dtype=np.float64)])
+
+
+def evaluate(control_points, parameters):
+    '''
+    De Boor's algorithm for all the parameters at once
+    the knot spans are found with a binary search
+    the degree drops below cubic if there aren't enough control points
+    returns (m, 2) curve points
+    '''
+    control_points = np.asarray(control_points, dtype=np.float64).reshape(-1, 2)
+    parameters = np.atleast_1d(np.asarray(parameters, dtype=np.float64))
+
+    if len(control_points) < 2:
+        raise ValueError("The falloff curve needs at least 2 control points")
+
+    degree = min(DEGREE, len(control_points) - 1)
+    knots = get_knots(len(control_points), degree)
+
+    spans = np.searchsorted(knots, parameters, side='right') - 1
+    spans = np.clip(spans, degree, len(control_points) - 1)
+
+    # (m, degree + 1, 2) control points affecting every parameter
+    points = control_points[spans[:, None] - degree + np.arange(degree + 1)]
+
+    for r in range(1, degree + 1):
+        for j in range(degree, r - 1, -1):
+            left = knots[j + spans - degree]
+            right = knots[j + 1 + spans - r]
+            alpha = ((parameters - left) / (right - left))[:, None]
+            points[:, j] = (1.0 - alpha) * points[:, j - 1] + alpha * points[:, j]
+
+    return points[:, degree]
+
+
+def _sample(control_points, sample_count):
+
+    control_points = np.asarray(control_points, dtype=np.float64).reshape(-1, 2)
+    degree = min(DEGREE, len(control_points) - 1)
+    max_parameter = len(control_points) - degree
+
+    curve_points = evaluate(control_points, np.linspace(0.0, max_parameter, sample_count))
+
+    # keep the curve monotone on x like the MEL evaluator did
+    previous_max = np.maximum.accumulate(np.r_[-1.0, curve_points[:-1, 0]])
+    curve_points = curve_points[curve_points[:, 0] > previous_max]
+
+    curve_points.flags.writeable = False
+
+    return curve_points
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _sample_cached(control_points, sample_count):
+    return _sample(control_points, sample_count)
+
+
+def sample(control_points, sample_count=SAMPLE_COUNT, use_cache=True):
+    '''
+    sample the falloff curve, the result is cached per control point set
+    returns read only (m, 2) points with increasing x
+    '''
+    if not use_cache:
+        return _sample(control_points, sample_count)
+
+    control_points = tuple(map(tuple, np.asarray(control_points, dtype=np.float64).reshape(-1, 2)))
+
+    return _sample_cached(control_points, sample_count)
+
+
+def get_ssc_string(curve_points):
+    '''
+    'y,x,1,y,x,1,...' for softSelect -ssc, the same order the MEL evaluator used
+    '''
+    return ",".join(f"{float(y)!r},{float(x)!r},1" for x, y in curve_points)
+
+
+def time_evaluation(control_points, runs=TIMING_RUNS, sample_count=SAMPLE_COUNT, use_cache=False):
+    '''
+    SSB.testTiming, evaluate the curve 'runs' times
+    returns the seconds it took
+    '''
+    start = time.perf_counter()
+
+    for _ in range(runs):
+        get_ssc_string(sample(control_points, sample_count, use_cache))
+
+    return time.perf_counter() - start
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from importlib import reload
+import time
+
+import numpy as np
+
+import maya.cmds as mc
+from maya import OpenMaya as om
+
+from facial_rig_toolset import mesh_cache
+from facial_rig_toolset import mesh_io
+from facial_rig_toolset import structure
+reload(mesh_cache)
+reload(mesh_io)
+reload(structure)
+
+
+FOLLICLE_MESH = structure.FASCIA_GROUP[6]
+FOLLICLE_GROUP = structure.DONT_GROUP[4]
+CTL = "_ctl"
+
+
+def create_follicle(name, mesh, uv, parent=None):
+    '''
+    follicle riding the mesh at the uv
+    '''
+    follicle = name
+    follicle_shape = mc.createNode('follicle', n='%sShape' % name)
+    mc.connectAttr('%s.outMesh' % mesh, '%s.inputMesh' % follicle_shape)
+    mc.connectAttr('%s.worldMatrix[0]' % mesh, '%s.inputWorldMatrix' % follicle_shape)
+    mc.connectAttr('%s.outRotate' % follicle_shape, '%s.rotate' % follicle)
+    mc.connectAttr('%s.outTranslate' % follicle_shape, '%s.translate' % follicle)
+    mc.setAttr('%s.parameterU' % follicle_shape, uv[0])
+    mc.setAttr('%s.parameterV' % follicle_shape, uv[1])
+    if parent:
+        mc.parent(follicle, parent)
+    return follicle, follicle_shape
+
+
+def negate_control(ctrl):
+    '''
+    the parent of the control moves against it so the control stays on the follicle
+    '''
+    parent_node = mc.listRelatives(ctrl, p=True)
+    if parent_node:
+        multiply_divide = mc.createNode('multiplyDivide', name='%s_neg_md' % ctrl)
+        for letter in ['X', 'Y', 'Z']:
+            mc.connectAttr('%s.translate%s' % (ctrl, letter), '%s.input1%s' % (multiply_divide, letter))
+            mc.connectAttr('%s.output%s' % (multiply_divide, letter), '%s.translate%s' % (parent_node[0], letter))
+            mc.setAttr('%s.input2%s' % (multiply_divide, letter), -1)
+
+
+def _get_control_name(control):
+    '''
+    'MouthLf_Corner_ctl' -> 'MouthLf_Corner', the name of its _grp, _sdk and _fol nodes
+    '''
+    return control[:-len(CTL)] if control.endswith(CTL) else control
+
+
+def _get_vertex_id(vertex):
+    if isinstance(vertex, str):
+        return int(vertex.rsplit('[', 1)[1][:-1])
+    return int(vertex)
+
+
+def _lap(timings, stage, start):
+    now = time.perf_counter()
+    timings[stage] = now - start
+    return now
+
+
+def attach_controls(pairs, mesh=FOLLICLE_MESH, verbose=True):
+    '''
+    glue the controls to the mesh with follicles in one undo chunk
+    pairs: [(vertex id or 'mesh.vtx[id]', control), ...]
+    every '<name>_grp' is snapped onto its vertex, '<name>_fol' follows the vertex uv,
+    '<name>_sdk' is point constrained to the follicle and '<name>_ctl' is negated
+    the vertex positions and uvs come from one bulk read and the cached uv table
+    returns the follicles and {stage: seconds}, None if the mesh, the control groups or the uvs are missing
+    '''
+    timings = OrderedDict()
+    start = time.perf_counter()
+
+    names = _get_control_names(pairs, mesh)
+    if names is None:
+        return
+
+    vertex_ids = np.array([_get_vertex_id(vertex) for vertex, _ in pairs], dtype=np.int64)
+    positions = mesh_io.get_points(mesh, world_space=True)[vertex_ids]
+
+    uvs = mesh_cache.get_vertex_uvs(mesh)[vertex_ids]
+    no_uvs = vertex_ids[np.isnan(uvs[:, 0])]
+    if len(no_uvs):
+        om.MGlobal.displayError(f"The vertices {no_uvs.tolist()} of '{mesh}' have no UVs")
+        return
+
+    _lap(timings, "lookup", start)
+
+    return _attach(names, positions, uvs, mesh, timings, verbose)
+
+
+def attach_controls_to_positions(pairs, mesh=FOLLICLE_MESH, verbose=True):
+    '''
+    attach_controls at arbitrary points, e.g. guide locators, instead of vertices
+    pairs: [(guide transform or world position, control), ...]
+    every position is moved onto the closest point of the mesh surface and gets its uv,
+    all of them in one query on the cached triangle index of the mesh
+    returns the follicles and {stage: seconds}, None if the mesh, the control groups or the uvs are missing
+    '''
+    timings = OrderedDict()
+    start = time.perf_counter()
+
+    names = _get_control_names(pairs, mesh)
+    if names is None:
+        return
+
+    queries = np.array([
+        mc.xform(guide, q=True, ws=True, rp=True) if isinstance(guide, str) else guide
+        for guide, _ in pairs
+    ], dtype=np.float64).reshape(-1, 3)
+    start = _lap(timings, "guides", start)
+
+    positions, uvs = mesh_cache.get_triangle_index(mesh).closest_uvs(queries)
+
+    no_uvs = [pairs[index][0] for index in np.flatnonzero(np.isnan(uvs[:, 0]))]
+    if no_uvs:
+        om.MGlobal.displayError(f"The closest points of {no_uvs} on '{mesh}' have no UVs")
+        return
+
+    _lap(timings, "closest point", start)
+
+    return _attach(names, positions, uvs, mesh, timings, verbose)
+
+
+def _get_control_names(pairs, mesh):
+    '''
+    the control names of the pairs, checks the mesh and the control groups exist
+    returns None if they don't
+    '''
+    if not mc.objExists(mesh):
+        om.MGlobal.displayError(f"The object '{mesh}' doesn't exist.")
+        return
+
+    names = [_get_control_name(control) for _, control in pairs]
+
+    missing = [f"{name}{suffix}" for name in names for suffix in ("_grp", "_sdk") if not mc.objExists(f"{name}{suffix}")]
+    if missing:
+        om.MGlobal.displayError(f"The control groups {missing} don't exist.")
+        return
+
+    return names
+
+
+def _attach(names, positions, uvs, mesh, timings, verbose=True):
+    '''
+    snap, make the follicles, parent, constrain and negate in one undo chunk
+    '''
+    start = time.perf_counter()
+
+    mc.undoInfo(openChunk=True, chunkName="attach_controls")
+    try:
+        for name, position in zip(names, positions.tolist()):
+            mc.xform('%s_grp' % name, t=position, ws=True)
+        start = _lap(timings, "snap", start)
+
+        follicles = [create_follicle('%s_fol' % name, mesh, uv)[0] for name, uv in zip(names, uvs.tolist())]
+        start = _lap(timings, "follicles", start)
+
+        follicles = mc.parent(follicles, FOLLICLE_GROUP)
+        for follicle in follicles:
+            mc.setAttr(f"{follicle}.visibility", 0)
+        start = _lap(timings, "parent", start)
+
+        for name, follicle in zip(names, follicles):
+            mc.pointConstraint(follicle, '%s_sdk' % name)
+        start = _lap(timings, "constraints", start)
+
+        for name in names:
+            negate_control(f"{name}{CTL}")
+        _lap(timings, "negate", start)
+
+    finally:
+        mc.undoInfo(closeChunk=True)
+
+    if verbose:
+        print(f"{len(names)} controls attached: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()))
+
+    return follicles, timings
@@ -1,15 +1,29 @@
 from functools import partial
 from importlib import reload
 
+import numpy as np
+
 import maya.cmds as mc
 from maya import OpenMaya as om
 
+from facial_rig_toolset import mesh_cache
+from facial_rig_toolset import mesh_io
 from facial_rig_toolset import model_check
+from facial_rig_toolset import spatial
+from facial_rig_toolset import symmetry
+reload(mesh_cache)
+reload(mesh_io)
 reload(model_check)
+reload(spatial)
+reload(symmetry)
 
 
 HEAD_GEOMETRY = "head_geo"
 BODY_GEOMETRY = "body_geo"
+BODY_VERTEX_IDS = "bodyVertexIds"
+BODY_TOPOLOGY = "bodyTopology"
+# the head and the body vertices are at the same place right after the cut
+VERTEX_MAP_TOLERANCE = 0.0001
 
 
 def _clean_up():
@@ -35,6 +49,59 @@ def _set_locked(obj, locked):
             print (f"Couldn't get locked-state of {obj}.{attr}")
 
 
+def _get_topology_hash(mesh):
+    return symmetry.get_topology_hash(*mesh_cache.get_topology(mesh))
+
+
+def record_body_vertex_map(head=HEAD_GEOMETRY, body=BODY_GEOMETRY):
+    '''
+    store on the head the body vertex id of every head vertex and the body topology it belongs to
+    the ids are matched by position, so it should be done while the head and the body still overlap
+    returns the body vertex ids, -1 for the head vertices without a body vertex
+    '''
+    body_vertex_ids, _ = spatial.find_nearest(
+        mesh_io.get_points(body, world_space=True),
+        mesh_io.get_points(head, world_space=True),
+        max_distance=VERTEX_MAP_TOLERANCE
+    )
+
+    for attr, attr_type in ((BODY_VERTEX_IDS, "Int32Array"), (BODY_TOPOLOGY, "string")):
+        if not mc.attributeQuery(attr, node=head, exists=True):
+            mc.addAttr(head, ln=attr, dt=attr_type)
+        mc.setAttr(f"{head}.{attr}", lock=False)
+
+    mc.setAttr(f"{head}.{BODY_VERTEX_IDS}", body_vertex_ids.tolist(), type="Int32Array")
+    mc.setAttr(f"{head}.{BODY_TOPOLOGY}", _get_topology_hash(body), type="string")
+
+    unmatched = int((body_vertex_ids < 0).sum())
+    if unmatched:
+        om.MGlobal.displayWarning(f"{unmatched} vertices of '{head}' have no vertex of '{body}' at the same place.")
+
+    return body_vertex_ids
+
+
+def get_body_vertex_map(head=HEAD_GEOMETRY, body=BODY_GEOMETRY):
+    '''
+    the body vertex ids recorded at the cut
+    None if there are none or the head or the body topology changed since, the vertices have to be matched by position then
+    '''
+    if not mc.objExists(head) or not mc.objExists(body):
+        return None
+
+    if not mc.attributeQuery(BODY_VERTEX_IDS, node=head, exists=True) or not mc.attributeQuery(BODY_TOPOLOGY, node=head, exists=True):
+        return None
+
+    body_vertex_ids = np.array(mc.getAttr(f"{head}.{BODY_VERTEX_IDS}") or [], dtype=np.int64)
+
+    if len(body_vertex_ids) != mesh_cache.get_vertex_count(head):
+        return None
+
+    if mc.getAttr(f"{head}.{BODY_TOPOLOGY}") != _get_topology_hash(body):
+        return None
+
+    return body_vertex_ids
+
+
 def head_cut():
     '''
     Make the head cut
@@ -93,6 +160,8 @@ def head_cut():
         mc.parent(HEAD_GEOMETRY, world=True)
 
     _clean_up()
+
+    record_body_vertex_map()
     
     _set_locked(BODY_GEOMETRY, True)
 
@@ -0,0 +1,281 @@
+from collections import OrderedDict
+from importlib import reload
+import zlib
+
+import numpy as np
+
+import maya.cmds as mc
+from maya.api import OpenMaya as om2
+
+from facial_rig_toolset import closest_point
+from facial_rig_toolset import mesh_io
+from facial_rig_toolset import soft_falloff
+reload(closest_point)
+reload(mesh_io)
+reload(soft_falloff)
+
+
+MAX_MESHES = 8
+
+BOUNDING_BOX = "bounding_box"
+VERTEX_COUNT = "vertex_count"
+TOPOLOGY = "topology"
+ADJACENCY = "adjacency"
+UVS = "uvs"
+VERTEX_UVS = "vertex_uvs"
+TRIANGLE_INDEX = "triangle_index"
+
+# dropped every time the mesh gets dirty, the rest only when the topology signature changes
+GEOMETRY_KEYS = (BOUNDING_BOX, TRIANGLE_INDEX)
+
+
+class _MeshEntry(object):
+    '''
+    cached facts of one mesh and the dirty callbacks watching its transform and shape
+    '''
+
+    def __init__(self, mesh):
+
+        self.values = {}
+        self.signature = None
+        self.dirty = False
+        self.callback_ids = []
+
+        dag_path = mesh_io._get_dag_path(mesh)
+        self.handle = om2.MObjectHandle(dag_path.transform())
+
+        nodes = [dag_path.transform()]
+        if dag_path.node() != dag_path.transform():
+            nodes.append(dag_path.node())
+        else:
+            dag_path.extendToShape()
+            nodes.append(dag_path.node())
+
+        for node in nodes:
+            self.callback_ids.append(om2.MNodeMessage.addNodeDirtyCallback(node, self._set_dirty))
+
+    def _set_dirty(self, *args):
+        self.dirty = True
+
+    def clear(self):
+        self.values.clear()
+        self.signature = None
+
+    def remove_callbacks(self):
+        for callback_id in self.callback_ids:
+            try:
+                om2.MMessage.removeCallback(callback_id)
+            except RuntimeError:
+                pass
+        self.callback_ids = []
+
+
+def get_topology_signature(mesh):
+    '''
+    vertex, face, face-vertex and edge counts, the current uv set and a checksum of its uvs
+    a dirty mesh keeps its topology and uv facts while this doesn't change
+    edits keeping every count (spin or flip an edge) aren't seen, call invalidate(mesh) after them
+    '''
+    mesh_fn = mesh_io.get_mesh_fn(mesh)
+    us, vs = mesh_fn.getUVs()
+
+    return (
+        mesh_fn.numVertices,
+        mesh_fn.numPolygons,
+        mesh_fn.numFaceVertices,
+        mesh_fn.numEdges,
+        mesh_fn.currentUVSetName(),
+        zlib.crc32(np.array(us, dtype=np.float32).tobytes() + np.array(vs, dtype=np.float32).tobytes())
+    )
+
+
+class MeshInfoCache(object):
+    '''
+    memoized mesh facts keyed by the mesh name
+    once the mesh gets dirty (moved, deformed, edited) the point based facts are rebuilt,
+    the topology and uv facts only if its topology signature changed,
+    an entry is dropped if the name points to another node, the least recently used mesh past max_size
+    '''
+
+    def __init__(self, max_size=MAX_MESHES):
+
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _get_entry(self, mesh):
+
+        entry = self._entries.get(mesh)
+
+        if entry is not None:
+            valid = entry.handle.isValid() and om2.MObjectHandle(mesh_io._get_dag_path(mesh).transform()).hashCode() == entry.handle.hashCode()
+            if not valid:
+                self.invalidate(mesh)
+                entry = None
+            elif entry.dirty:
+                for key in GEOMETRY_KEYS:
+                    entry.values.pop(key, None)
+                if entry.values and get_topology_signature(mesh) != entry.signature:
+                    entry.clear()
+                entry.dirty = False
+
+        if entry is None:
+            entry = _MeshEntry(mesh)
+            self._entries[mesh] = entry
+
+        self._entries.move_to_end(mesh)
+
+        while len(self._entries) > self.max_size:
+            _, evicted = self._entries.popitem(last=False)
+            evicted.remove_callbacks()
+
+        return entry
+
+    def get(self, mesh, key, build):
+        '''
+        the cached value of the mesh, build(mesh) makes it if it isn't cached or the mesh is dirty
+        '''
+        if not mc.objExists(mesh):
+            self.invalidate(mesh)
+            raise RuntimeError(f"The object '{mesh}' doesn't exist.")
+
+        entry = self._get_entry(mesh)
+
+        if key not in entry.values:
+            if key not in GEOMETRY_KEYS and entry.signature is None:
+                entry.signature = get_topology_signature(mesh)
+            entry.values[key] = build(mesh)
+
+        return entry.values[key]
+
+    def invalidate(self, mesh=None):
+        '''
+        forget the mesh, or every mesh if None
+        '''
+        meshes = list(self._entries) if mesh is None else [mesh]
+
+        for mesh_name in meshes:
+            entry = self._entries.pop(mesh_name, None)
+            if entry is not None:
+                entry.remove_callbacks()
+
+
+def _build_adjacency(mesh):
+    vertex_count, face_vertex_counts, face_vertex_indices = get_topology(mesh)
+
+    return soft_falloff.get_adjacency(vertex_count, soft_falloff.get_edges(face_vertex_counts, face_vertex_indices))
+
+
+def _build_uvs(mesh):
+    mesh_fn = mesh_io.get_mesh_fn(mesh)
+    us, vs = mesh_fn.getUVs()
+    uv_counts, uv_ids = mesh_fn.getAssignedUVs()
+
+    return (
+        np.column_stack([np.array(us, dtype=np.float64), np.array(vs, dtype=np.float64)]),
+        np.array(uv_counts, dtype=np.int32),
+        np.array(uv_ids, dtype=np.int32)
+    )
+
+
+def build_vertex_uv_table(vertex_count, face_vertex_counts, face_vertex_indices, uvs, uv_counts, uv_ids):
+    '''
+    (vertex_count, 2) uv of every vertex, nan for the vertices without uvs
+    a vertex on a uv seam gets its lowest uv id, the first one ConvertSelectionToUVs returned
+    '''
+    face_vertex_counts = np.asarray(face_vertex_counts, dtype=np.int64)
+    face_vertex_indices = np.asarray(face_vertex_indices, dtype=np.int64)
+    uv_counts = np.asarray(uv_counts, dtype=np.int64)
+
+    # getAssignedUVs skips the faces without uvs
+    mapped = np.repeat(uv_counts > 0, face_vertex_counts)
+
+    lowest_uv_ids = np.full(vertex_count, np.iinfo(np.int64).max)
+    np.minimum.at(lowest_uv_ids, face_vertex_indices[mapped], np.asarray(uv_ids, dtype=np.int64))
+
+    vertex_uvs = np.full((vertex_count, 2), np.nan)
+    has_uv = lowest_uv_ids < len(uvs)
+    vertex_uvs[has_uv] = np.asarray(uvs, dtype=np.float64).reshape(-1, 2)[lowest_uv_ids[has_uv]]
+
+    return vertex_uvs
+
+
+def _build_vertex_uvs(mesh):
+    vertex_count, face_vertex_counts, face_vertex_indices = get_topology(mesh)
+
+    return build_vertex_uv_table(vertex_count, face_vertex_counts, face_vertex_indices, *get_uvs(mesh))
+
+
+def _build_triangle_index(mesh):
+    vertex_count, face_vertex_counts, face_vertex_indices = get_topology(mesh)
+    uvs, uv_counts, uv_ids = get_uvs(mesh)
+
+    return closest_point.TriangleIndex(
+        mesh_io.get_points(mesh, world_space=True),
+        face_vertex_counts,
+        face_vertex_indices,
+        uvs,
+        closest_point.get_face_vertex_uv_ids(face_vertex_counts, uv_counts, uv_ids)
+    )
+
+
+# drop the callbacks of the cache from before a reload
+try:
+    _cache.invalidate()
+except NameError:
+    pass
+
+_cache = MeshInfoCache()
+
+
+def get_bounding_box(mesh):
+    '''
+    exactWorldBoundingBox of the mesh
+    '''
+    return _cache.get(mesh, BOUNDING_BOX, mc.exactWorldBoundingBox)
+
+
+def get_vertex_count(mesh):
+    return _cache.get(mesh, VERTEX_COUNT, mesh_io.get_vertex_count)
+
+
+def get_topology(mesh):
+    '''
+    mesh_io.get_topology, the arrays are shared so don't change them
+    '''
+    return _cache.get(mesh, TOPOLOGY, mesh_io.get_topology)
+
+
+def get_adjacency(mesh):
+    '''
+    CSR vertex neighbours (offsets, neighbours) of the mesh
+    '''
+    return _cache.get(mesh, ADJACENCY, _build_adjacency)
+
+
+def get_uvs(mesh):
+    '''
+    (uv count, 2) uv positions, uv count per face and the uv id of every face-vertex
+    of the current uv set
+    '''
+    return _cache.get(mesh, UVS, _build_uvs)
+
+
+def get_vertex_uvs(mesh):
+    '''
+    (vertex count, 2) uv of every vertex, built once from one bulk uv read
+    '''
+    return _cache.get(mesh, VERTEX_UVS, _build_vertex_uvs)
+
+
+def get_triangle_index(mesh):
+    '''
+    closest_point.TriangleIndex of the mesh in world space with its uvs
+    '''
+    return _cache.get(mesh, TRIANGLE_INDEX, _build_triangle_index)
+
+
+def invalidate(mesh=None):
+    _cache.invalidate(mesh)
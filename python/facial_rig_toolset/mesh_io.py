@@ -0,0 +1,153 @@
+import numpy as np
+
+import maya.cmds as mc
+from maya.api import OpenMaya as om2
+
+
+def _get_dag_path(mesh):
+    selection = om2.MSelectionList()
+    selection.add(mesh)
+
+    return selection.getDagPath(0)
+
+
+def get_mesh_fn(mesh):
+    '''
+    MFnMesh for the mesh transform or shape
+    '''
+    return om2.MFnMesh(_get_dag_path(mesh))
+
+
+def _get_space(world_space):
+    return om2.MSpace.kWorld if world_space else om2.MSpace.kObject
+
+
+def get_vertex_count(mesh):
+    return mc.polyEvaluate(mesh, v=True)
+
+
+def get_topology(mesh):
+    '''
+    vertex count, vertex count per face and the face-vertex ids
+    '''
+    mesh_fn = get_mesh_fn(mesh)
+    face_vertex_counts, face_vertex_indices = mesh_fn.getVertices()
+
+    return (
+        mesh_fn.numVertices,
+        np.array(face_vertex_counts, dtype=np.int32),
+        np.array(face_vertex_indices, dtype=np.int32)
+    )
+
+
+def get_points(mesh, world_space=False):
+    '''
+    read all the vertex positions in one query
+    returns (n, 3) float64 array
+    '''
+    if world_space:
+        flat_points = mc.xform(f"{mesh}.vtx[*]", q=True, ws=True, t=True)
+    else:
+        flat_points = mc.xform(f"{mesh}.vtx[*]", q=True, os=True, t=True)
+
+    return np.array(flat_points, dtype=np.float64).reshape(-1, 3)
+
+
+def get_component_points(components, world_space=True):
+    '''
+    positions of the given vertices (or other components) in one query
+    returns (n, 3) float64 array
+    '''
+    if world_space:
+        flat_points = mc.xform(components, q=True, ws=True, t=True)
+    else:
+        flat_points = mc.xform(components, q=True, os=True, t=True)
+
+    return np.array(flat_points, dtype=np.float64).reshape(-1, 3)
+
+
+def get_centroid(components, world_space=True):
+    '''
+    average position of the components
+    '''
+    return get_component_points(components, world_space).mean(axis=0)
+
+
+def get_weighted_centroid(mesh, indices, weights, world_space=True):
+    '''
+    weighted average position of the mesh vertices, e.g. with soft selection weights
+    '''
+    weights = np.asarray(weights, dtype=np.float64)
+    points = get_points(mesh, world_space)[np.asarray(indices, dtype=np.int64)]
+
+    if not weights.sum():
+        return points.mean(axis=0)
+
+    return np.average(points, axis=0, weights=weights)
+
+
+def set_points(mesh, points, world_space=False):
+    '''
+    write all the vertex positions in one call
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    mesh_fn = get_mesh_fn(mesh)
+    mesh_fn.setPoints(om2.MPointArray(points.tolist()), _get_space(world_space))
+    mesh_fn.updateSurface()
+
+
+def _get_shape(mesh):
+    if mc.objectType(mesh) == 'mesh':
+        return mesh
+    return mc.listRelatives(mesh, shapes=True, noIntermediate=True, fullPath=True)[0]
+
+
+def edit_points(mesh, points, world_space=False):
+    '''
+    set_points that can be undone: the offsets from the current positions are added
+    to the vertex tweaks (.pnts) and written back with one setAttr
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    offsets = points - get_points(mesh, world_space)
+
+    if world_space:
+        matrix = np.array(mc.xform(mesh, q=True, ws=True, m=True), dtype=np.float64).reshape(4, 4)[:3, :3]
+        offsets = offsets @ np.linalg.inv(matrix)
+
+    pnts = f"{_get_shape(mesh)}.pnts[0:{len(points) - 1}]"
+    tweaks = np.array(mc.getAttr(pnts), dtype=np.float64).reshape(-1, 3) + offsets
+    mc.setAttr(pnts, *tweaks.ravel().tolist())
+
+
+def get_vertex_indices(components):
+    '''
+    vertex ids from component names like 'head_geo.vtx[12]' or 'head_geo.vtx[3:7]'
+    '''
+    indices = []
+
+    for component in mc.ls(components, flatten=True):
+        if ".vtx[" not in component:
+            continue
+        indices.append(int(component.rsplit('[', 1)[1][:-1]))
+
+    return np.array(indices, dtype=np.int64)
+
+
+def vertex_components(mesh, indices):
+    '''
+    component names for the vertex ids, consecutive ids are packed into ranges
+    '''
+    indices = np.unique(np.asarray(indices, dtype=np.int64))
+
+    if not len(indices):
+        return []
+
+    breaks = np.flatnonzero(np.diff(indices) != 1)
+    starts = indices[np.r_[0, breaks + 1]]
+    ends = indices[np.r_[breaks, len(indices) - 1]]
+
+    return [
+        f"{mesh}.vtx[{start}]" if start == end else f"{mesh}.vtx[{start}:{end}]"
+        for start, end in zip(starts, ends)
+    ]
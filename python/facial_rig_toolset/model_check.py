@@ -210,6 +210,17 @@ def delete_history():
 def check_symmetry():
     '''
     check symmetry
+    select the asymmetric vertices of the selected model with the array version of abCheckSym
+    '''
+    # symmetry_tools imports head_cut, which imports this module
+    from facial_rig_toolset import symmetry_tools
+
+    return symmetry_tools.check_symmetry()
+
+
+def open_symmetry_tools():
+    '''
+    open the abSymMesh window with the mirror, flip, revert, add/subtract and symmetrize tools
     '''
     symmetry_script_path = os.path.join(
         os.path.dirname(__file__), 'mel', 'symmetry.mel')
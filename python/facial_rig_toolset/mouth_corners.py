@@ -1,19 +1,45 @@
 from importlib import reload
-from functools import reduce
+from collections import namedtuple
 import math
 import os
+import time
+
+import numpy as np
 
 import maya.cmds as mc
 import math
 from maya import OpenMaya as om
+from maya.api import OpenMaya as om2
 from maya import mel
 
+from facial_rig_toolset import anim_io
+from facial_rig_toolset import follicles
+from facial_rig_toolset import combo_solver
+from facial_rig_toolset import delta_math
 from facial_rig_toolset import model_check
 from facial_rig_toolset import head_cut
+from facial_rig_toolset import mesh_cache
+from facial_rig_toolset import mesh_io
 from facial_rig_toolset import structure
+from facial_rig_toolset import symmetry_tools
+from facial_rig_toolset import sparse_delta
+from facial_rig_toolset import shape_library
+from facial_rig_toolset import sparse_shapes
+from facial_rig_toolset import soft_falloff
+reload(anim_io)
+reload(follicles)
+reload(combo_solver)
+reload(delta_math)
 reload(model_check)
 reload(head_cut)
+reload(mesh_io)
+reload(mesh_cache)
 reload(structure)
+reload(symmetry_tools)
+reload(sparse_delta)
+reload(shape_library)
+reload(sparse_shapes)
+reload(soft_falloff)
 
 
 MOUTH_CORNER = "mouth_corner"
@@ -31,6 +57,7 @@ MOUTH_CORNER_CONTROL_NAMES = ["MouthLf_Corner_ctl", "MouthRt_Corner_ctl"]
 MOUTH_CONTROL_GROUPS = ["_neg", "_sdk", "_grp"]
 
 BLEND_SHAPE = "_blendShape"
+COMBO = "_combo"
 CTL = "_ctl"
 
 HEIGHT_MULTIPLIER = 1
@@ -39,6 +66,21 @@ ANNOTATION_HEIGHT_MULTIPLIER = 2
 KEYFRAME_COUNT = 9
 MIRROR_SIZE_BBOX_MULTIPLIER = 45
 
+# frame: position of the soft cluster handle, frame 0 is the neutral
+SOFT_CLUSTER_POSES = {
+    0: {'tx': 0, 'ty': 0, 'tz': 0},
+    10: {'tx': 0, 'ty': 1, 'tz': 0},
+    20: {'tx': 1, 'ty': 1, 'tz': -1},
+    30: {'tx': 1, 'ty': 0, 'tz': -1},
+    40: {'tx': 1, 'ty': -1, 'tz': -1},
+    50: {'tx': 0, 'ty': -1, 'tz': 0},
+    60: {'tx': -1, 'ty': -1, 'tz': 0},
+    70: {'tx': -1, 'ty': 0, 'tz': 0},
+    80: {'tx': -1, 'ty': 1, 'tz': 0},
+}
+
+SoftSelection = namedtuple("SoftSelection", ["node", "indices", "weights"])
+
 
 def _annotate_model(model_name, model_position):
     '''
@@ -78,7 +120,7 @@ def _annotate_model(model_name, model_position):
 
 
 def _get_head_bbox():
-    return mc.exactWorldBoundingBox(head_cut.HEAD_GEOMETRY)
+    return mesh_cache.get_bounding_box(head_cut.HEAD_GEOMETRY)
 
 
 def _set_locked(obj, locked):
@@ -197,61 +239,24 @@ def call_ss_buddy():
     mel.eval(f'source "{ss_buddy_script_path}"')
 
 
-def set_soft_cluster_shapes():
+def _get_pose_arrays(poses):
     '''
-    select the soft cluster handle
-    set 8 frames on the timeline
-    position the cluster with step 1
-    '''
-
-    soft_cluster_position = {
-        0: {
-            'tx':0,
-            'ty':0,
-            'tz':0
-        },
-        10:{
-            'tx':0,
-            'ty':1,
-            'tz':0  
-        },
-        20:{
-            'tx':1,
-            'ty':1,
-            'tz':-1
-        },
-        30:{
-            'tx':1,
-            'ty':0,
-            'tz':-1 
-        },
-        40:{
-            'tx':1,
-            'ty':-1,
-            'tz':-1 
-        },
-        50:{
-            'tx':0,
-            'ty':-1,
-            'tz':0
-        },
-        60:{
-            'tx':-1,
-            'ty':-1,
-            'tz':0
-        },
-        70:{
-            'tx':-1,
-            'ty':0,
-            'tz':0
-        },
-        80:{
-            'tx':-1,
-            'ty':1,
-            'tz':0
-        }
+    {frame: {'tx':, 'ty':, 'tz':}} as sorted frames and (n, 3) translations
+    '''
+    frames = sorted(poses)
+    translations = np.array([[poses[frame]['tx'], poses[frame]['ty'], poses[frame]['tz']] for frame in frames], dtype=np.float64)
 
-    }
+    return np.array(frames, dtype=np.float64), translations
+
+
+def set_soft_cluster_shapes(poses=None, batched=True):
+    '''
+    select the soft cluster handle
+    key the cluster at every pose of the pose table, SOFT_CLUSTER_POSES by default
+    batched writes every channel as one anim curve without changing the current time
+    '''
+    if poses is None:
+        poses = SOFT_CLUSTER_POSES
 
     if not mc.objExists(MOUTH_CORNER_CLUSTER_NAME):
         om.MGlobal.displayError(f"The cluster '{MOUTH_CORNER_CLUSTER_NAME}' doesn't exist. Please, rename the cluster handle as '{MOUTH_CORNER_CLUSTER_NAME}'")
@@ -274,10 +279,20 @@ def set_soft_cluster_shapes():
         if button == "No":
             return
 
-    # keyframe the cluster hamdle each 10th frame 8 times
-    for key_frame_number in range(0, KEYFRAME_COUNT*10, 10):
+    if batched:
+        frames, translations = _get_pose_arrays(poses)
+        anim_io.set_translate_keys(MOUTH_CORNER_CLUSTER_NAME, frames, translations, tangent="linear")
+    else:
+        _key_soft_cluster_per_frame(poses)
+
+
+def _key_soft_cluster_per_frame(poses):
+    '''
+    the old way, move the time slider to every pose frame and key the handle
+    '''
+    for key_frame_number in sorted(poses):
         mc.currentTime(key_frame_number, edit=True)
-        coords = soft_cluster_position[key_frame_number]
+        coords = poses[key_frame_number]
         mc.xform(
             MOUTH_CORNER_CLUSTER_NAME,
             t=[
@@ -374,10 +389,14 @@ def make_claster_mask_shapes():
 
 
 
-def make_mouth_corner_shape():
+def make_mouth_corner_shape(sparse=False, baked=True):
     '''
     makes 8 mouth corners shapes that should be cleaned by the rigger
     posiotn this 8 shapes in a square manner
+    sparse keeps the shapes as sparse deltas instead of full meshes,
+    materialize_mouth_corner_shapes() brings them back for sculpting
+    baked reads the points of all the poses first and writes the shapes in one pass,
+    the cluster poses are computed without evaluating the scene if the model only has the cluster
     '''
     model_selected = mc.ls(selection=True, type='transform')
 
@@ -394,7 +413,7 @@ def make_mouth_corner_shape():
     # checking if the mouth corner shapes already in the scene
     shapes_exist = []
     for mouth_shape in MOUTH_CORNER_LF_NAMES:
-        if mc.objExists(mouth_shape):
+        if mc.objExists(mouth_shape) or sparse_shapes.is_stored(mouth_shape):
             shapes_exist.append(mouth_shape)
 
     if len(shapes_exist) > 0:
@@ -409,8 +428,11 @@ def make_mouth_corner_shape():
         if button == "No":
             return
         else:
-            for mouth_shape in MOUTH_CORNER_LF_NAMES:
-                mc.delete(mouth_shape)
+            for mouth_shape in shapes_exist:
+                if mc.objExists(mouth_shape):
+                    mc.delete(mouth_shape)
+                if sparse_shapes.is_stored(mouth_shape):
+                    mc.delete(sparse_shapes.get_sparse_delta_node(mouth_shape))
 
     # getting the bounding box of the model
     model_width_bbox = math.ceil(_get_head_bbox()[5])
@@ -435,6 +457,11 @@ def make_mouth_corner_shape():
         80: [model_pos_x - model_width_bbox*2, model_pos_y, model_pos_z]
     }
 
+    if baked:
+        frames = [frame_number*10 for frame_number in range(1, KEYFRAME_COUNT)]
+        _bake_mouth_corner_shapes(model_selected[0], frames, mouth_corner_lf_models_pos, sparse)
+        return
+
     frame_number = 1
     for model_name in MOUTH_CORNER_LF_NAMES:
 
@@ -448,21 +475,179 @@ def make_mouth_corner_shape():
             position = mouth_corner_lf_models_pos[current_time]
             mc.xform(new_model, ws=True, t=position)
 
+            if sparse:
+                sparse_shapes.store_shape(new_model[0])
+
             frame_number += 1
 
     mc.currentTime(0, edit=True)
 
 
-def _get_combo_shapes(side):
+def _get_mesh_template(model):
     '''
-    connect the combo shapes with the mouth shapes 
-    depending on the side
+    history free, unlocked duplicate of the model at the world level
+    the baked shapes are duplicated from it and get their points set in bulk
     '''
-    i = 0
+    template = mc.duplicate(model, n=f"{model}_template")[0]
+    _set_locked(template, False)
+    mc.delete(template, ch=True)
 
-    combo_shapes = []
-    mouth_shapes = []
+    if mc.listRelatives(template, parent=True):
+        template = mc.parent(template, world=True)[0]
+
+    return template
+
+
+def _bake_mouth_corner_shapes(model, frames, positions, sparse=False):
+    '''
+    write the mouth corner shapes from the points of the model at the frames
+    the meshes are copies of one history free duplicate with the points set in bulk, in one undo step,
+    sparse writes the sparse delta nodes straight away without making any mesh
+    '''
+    pose_points = _get_pose_points(model, frames)
+
+    if sparse:
+        head_points = mesh_io.get_points(head_cut.HEAD_GEOMETRY)
+
+        for model_name, frame, points in zip(MOUTH_CORNER_LF_NAMES, frames, pose_points):
+            shape_delta = sparse_delta.SparseDelta.from_points(head_points, points)
+            sparse_shapes.write_sparse_delta_node(model_name, shape_delta, positions[frame])
+
+        return
+
+    # one undo step for all the shapes, the points are written with an undoable setAttr
+    mc.undoInfo(openChunk=True, chunkName="bake_mouth_corner_shapes")
+    try:
+        template = _get_mesh_template(model)
+
+        for model_name, frame, points in zip(MOUTH_CORNER_LF_NAMES, frames, pose_points):
+            new_model = mc.duplicate(template, n=model_name)[0]
+            mesh_io.edit_points(new_model, points)
+            mc.xform(new_model, ws=True, t=positions[frame])
+
+        mc.delete(template)
+    finally:
+        mc.undoInfo(closeChunk=True)
+
+
+def _get_pose_points(model, frames):
+    '''
+    object space points of the model at the frames as (frames, n, 3)
+    a model deformed only by a translated cluster is computed from the cluster weights,
+    anything else is evaluated frame by frame and read in bulk
+    '''
+    pose_points = _get_cluster_pose_points(model, frames)
+
+    if pose_points is not None:
+        return pose_points
+
+    pose_points = []
+    for frame in frames:
+        mc.currentTime(frame, edit=True)
+        pose_points.append(mesh_io.get_points(model))
+
+    mc.currentTime(0, edit=True)
+
+    return np.array(pose_points)
+
+
+def _get_cluster_pose_points(model, frames):
+    '''
+    base points + cluster weight * handle translation at every frame
+    returns None if the model has other deformers or the handle does more than translate
+    '''
+    deformers = mc.ls(mc.listHistory(model, pruneDagObjects=True) or [], type="geometryFilter")
+
+    if len(deformers) != 1 or mc.nodeType(deformers[0]) != "cluster":
+        return None
+
+    cluster = deformers[0]
+    handle = (mc.listConnections(f"{cluster}.matrix", source=True, destination=False) or [None])[0]
+    orig_shape = (mc.listConnections(f"{cluster}.originalGeometry[0]", source=True, destination=False, shapes=True) or [None])[0]
+
+    if not handle or not orig_shape:
+        return None
+
+    if mc.keyframe(handle, attribute=["rotate", "scale"], q=True, keyframeCount=True):
+        return None
+
+    base_points = mesh_io.get_points(orig_shape)
+    weights = mc.percent(cluster, f"{model}.vtx[*]", q=True, v=True) or []
+
+    if len(weights) != len(base_points):
+        return None
+
+    # the handle moves in the space of its group, the points are in the object space of the model
+    parent_rotation = np.array(mc.getAttr(f"{handle}.parentMatrix[0]")).reshape(4, 4)[:3, :3]
+    model_rotation = np.array(mc.xform(model, q=True, ws=True, m=True)).reshape(4, 4)[:3, :3]
+
+    translations = np.array([mc.getAttr(f"{handle}.translate", time=frame)[0] for frame in frames])
+    translations = translations @ parent_rotation @ np.linalg.inv(model_rotation)
+
+    return delta_math.get_cluster_pose_points(base_points, weights, translations)
+
+
+def store_mouth_corner_shapes(shapes=None):
+    '''
+    keep the mouth corner and combo shapes as sparse deltas and delete the meshes
+    '''
+    if shapes is None:
+        shapes = MOUTH_CORNER_LF_NAMES + MOUTH_CORNER_RT_NAMES + MOUTH_CORNER_LF_COMBO_NAMES + MOUTH_CORNER_RT_COMBO_NAMES
+
+    return [sparse_shapes.store_shape(shape) for shape in shapes if mc.objExists(shape)]
 
+
+def materialize_mouth_corner_shapes(shapes=None):
+    '''
+    rebuild the meshes of the mouth corner shapes stored as sparse deltas
+    '''
+    if shapes is None:
+        shapes = MOUTH_CORNER_LF_NAMES + MOUTH_CORNER_RT_NAMES + MOUTH_CORNER_LF_COMBO_NAMES + MOUTH_CORNER_RT_COMBO_NAMES
+
+    return [sparse_shapes.materialize_shape(shape) for shape in shapes if sparse_shapes.is_stored(shape)]
+
+
+def _get_library_kinds():
+    '''
+    {shape: kind} of every shape mouth_corners builds
+    '''
+    kinds = {shape: shape_library.SHAPE for shape in MOUTH_CORNER_LF_NAMES + MOUTH_CORNER_RT_NAMES}
+    kinds.update({shape: shape_library.MASK for shape in MOUTH_MASK_NAMES})
+    kinds.update({shape: shape_library.COMBO for shape in MOUTH_CORNER_LF_COMBO_NAMES + MOUTH_CORNER_RT_COMBO_NAMES})
+
+    return kinds
+
+
+def export_mouth_shape_library(path, compress=True):
+    '''
+    write the mouth corner shapes, masks and combos in the scene into one shape library file
+    '''
+    kinds = _get_library_kinds()
+    shapes = [shape for shape in kinds if mc.objExists(shape) or sparse_shapes.is_stored(shape)]
+
+    if not shapes:
+        om.MGlobal.displayError("There are no mouth corner shapes in the scene to export")
+        return
+
+    return sparse_shapes.export_shape_library(path, shapes, kinds, compress=compress)
+
+
+def import_mouth_shape_library(path, shapes=None, materialize=False):
+    '''
+    bring the shapes of the library back as sparse deltas, materialize rebuilds the meshes too
+    '''
+    if not os.path.isfile(path):
+        om.MGlobal.displayError(f"The shape library '{path}' doesn't exist.")
+        return
+
+    return sparse_shapes.import_shape_library(path, shapes, materialize=materialize)
+
+
+def _get_combo_targets(side):
+    '''
+    [(combo shape, [a shape, b shape], corner shape), ...] of the side
+    the corner shape sits between a and b on the mouth corner ring
+    '''
     if side.lower().startswith("l"):
         mouth_shapes = MOUTH_CORNER_LF_NAMES
         combo_shapes = MOUTH_CORNER_LF_COMBO_NAMES
@@ -470,9 +655,9 @@ def _get_combo_shapes(side):
         mouth_shapes = MOUTH_CORNER_RT_NAMES
         combo_shapes = MOUTH_CORNER_RT_COMBO_NAMES
 
-    for combo_shape in combo_shapes:
+    combo_targets = []
+    for combo_shape, corner_shape_ind in zip(combo_shapes, CORNER_SHAPE_LOCATION):
 
-        corner_shape_ind = CORNER_SHAPE_LOCATION[i]
         if corner_shape_ind == 7:
             a_shape_ind = 0
             b_shape_ind = corner_shape_ind - 1
@@ -480,15 +665,156 @@ def _get_combo_shapes(side):
             a_shape_ind = corner_shape_ind - 1
             b_shape_ind = corner_shape_ind + 1
 
-        shapes_to_blend = [mouth_shapes[a_shape_ind], mouth_shapes[b_shape_ind], mouth_shapes[corner_shape_ind]]
+        combo_targets.append((combo_shape, [mouth_shapes[a_shape_ind], mouth_shapes[b_shape_ind]], mouth_shapes[corner_shape_ind]))
+
+    return combo_targets
+
+
+def _get_combo_shapes(side):
+    '''
+    connect the combo shapes with the mouth shapes 
+    depending on the side
+    '''
+    for combo_shape, (a_shape, b_shape), corner_shape in _get_combo_targets(side):
+
+        shapes_to_blend = [a_shape, b_shape, corner_shape]
 
         mc.blendShape(shapes_to_blend, combo_shape, topologyCheck=False, w=[(0,-1), (1, -1), (2, 1)], name=f"{combo_shape}{BLEND_SHAPE}")
-        i += 1
 
 
-def _create_combo_shapes(side):
+def _write_combo_shapes(side, combo_position, sparse=False):
+    '''
+    combo = head + corner delta - a delta - b delta computed on the point arrays
+    the combos are baked meshes (or sparse deltas), there is no blendShape behind them
+    '''
+    combo_targets = _get_combo_targets(side)
+    head_points = mesh_io.get_points(head_cut.HEAD_GEOMETRY)
+
+    primary_points = {}
+    combo_points = {}
+    combo_names = {}
+    for combo_shape, shapes, corner_shape in combo_targets:
+        for shape in shapes:
+            if shape not in primary_points:
+                primary_points[shape] = mesh_io.get_points(shape)
+        combo_points[tuple(shapes)] = mesh_io.get_points(corner_shape)
+        combo_names[tuple(sorted(shapes))] = combo_shape
+
+    correctives = combo_solver.solve_corrective_points(head_points, primary_points, combo_points)
+
+    _write_corrective_shapes(
+        {combo_names[key]: points for key, points in correctives.items()},
+        {combo_shape: position for (combo_shape, _, _), position in zip(combo_targets, combo_position)},
+        head_points,
+        sparse
+    )
+
+
+def _write_corrective_shapes(corrective_points, positions, base_points, sparse=False):
+    '''
+    {name: points} as meshes copied from one head template, or as sparse delta nodes, in one undo step
+    '''
+    template = None
+
+    mc.undoInfo(openChunk=True, chunkName="write_corrective_shapes")
+    try:
+        for name, points in corrective_points.items():
+
+            if sparse:
+                sparse_shapes.write_sparse_delta_node(name, sparse_delta.SparseDelta.from_points(base_points, points), positions[name])
+                continue
+
+            if template is None:
+                template = _get_mesh_template(head_cut.HEAD_GEOMETRY)
+
+            new_shape = mc.duplicate(template, n=name)[0]
+            mesh_io.edit_points(new_shape, points)
+            mc.xform(new_shape, ws=True, t=positions[name])
+
+        if template is not None:
+            mc.delete(template)
+    finally:
+        mc.undoInfo(closeChunk=True)
+
+
+def make_combination_shapes(combos, sparse=False):
+    '''
+    corrective shapes for combos of any number of primary shapes, jaw open x smile x wide etc.
+    combos: {sculpted combo shape: [primary shapes it is made of]}
+    every corrective removes the primaries and the correctives of the smaller combos inside it
+    and is named '<sculpted combo shape>_combo' next to the sculpted shape
+    '''
+    shapes = set(combos)
+    for primaries in combos.values():
+        shapes.update(primaries)
+
+    # bring back the shapes kept as sparse deltas
+    materialize_mouth_corner_shapes([shape for shape in shapes if sparse_shapes.is_stored(shape)])
+
+    shapes_dont_exist = [shape for shape in sorted(shapes) if not mc.objExists(shape)]
+    if shapes_dont_exist:
+        om.MGlobal.displayError(f"The following shapes '{shapes_dont_exist}' don't exist.")
+        return
+
+    combo_names = {tuple(sorted(primaries)): f"{combo_shape}{COMBO}" for combo_shape, primaries in combos.items()}
+
+    # checking if the corrective shapes already in the scene
+    existing_combos = [
+        combo_name for combo_name in sorted(combo_names.values())
+        if mc.objExists(combo_name) or sparse_shapes.is_stored(combo_name)
+    ]
+    if existing_combos:
+        button = mc.confirmDialog(
+            title="The Combo Shape(s) Exist",
+            message=f"It seems, the combo shapes {existing_combos} exist. Are you sure you want to re-create them? The modification will be lost.",
+            button=["Yes", "No"],
+            defaultButton="No",
+            cancelButton="No",
+            dismissString="No"
+        )
+        if button == "No":
+            return
+
+    head_points = mesh_io.get_points(head_cut.HEAD_GEOMETRY)
+    primary_points = {
+        primary: mesh_io.get_points(primary)
+        for primary in sorted(shapes.difference(combos))
+    }
+    combo_points = {tuple(primaries): mesh_io.get_points(combo_shape) for combo_shape, primaries in combos.items()}
+
+    try:
+        correctives = combo_solver.solve_corrective_points(head_points, primary_points, combo_points)
+    except ValueError as e:
+        om.MGlobal.displayError(str(e))
+        return
+
+    for combo_name in existing_combos:
+        if mc.objExists(combo_name):
+            mc.delete(combo_name)
+        if sparse_shapes.is_stored(combo_name):
+            mc.delete(sparse_shapes.get_sparse_delta_node(combo_name))
+
+    model_width_bbox = math.ceil(_get_head_bbox()[5])
+    positions = {}
+    for combo_shape, primaries in combos.items():
+        position = mc.xform(combo_shape, ws=True, q=True, rp=1)
+        positions[combo_names[tuple(sorted(primaries))]] = [position[0] + model_width_bbox*WIDTH_MULTIPLIER, position[1], position[2]]
+
+    _write_corrective_shapes(
+        {combo_names[key]: points for key, points in correctives.items()},
+        positions,
+        head_points,
+        sparse
+    )
+
+    return list(combo_names.values())
+
+
+def _create_combo_shapes(side, live=True, sparse=False):
     '''
     makes combo shapes
+    live connects every combo to its mouth shapes with a blendShape,
+    otherwise the combos are computed once from the points, sparse keeps them as sparse deltas
     '''
     combo_shapes = []
     mouth_shapes = []
@@ -500,6 +826,9 @@ def _create_combo_shapes(side):
         mouth_shapes = MOUTH_CORNER_RT_NAMES
         combo_shapes = MOUTH_CORNER_RT_COMBO_NAMES
 
+    # bring back the shapes kept as sparse deltas
+    materialize_mouth_corner_shapes(mouth_shapes)
+
     # check if the mouth corner shapes exist
     shapes_dont_exist = []
     for mouth_shape in mouth_shapes:
@@ -511,7 +840,7 @@ def _create_combo_shapes(side):
         return 
 
     # check if the combo shapes exist
-    if any(map(mc.objExists, combo_shapes)):
+    if any(map(mc.objExists, combo_shapes)) or any(map(sparse_shapes.is_stored, combo_shapes)):
         button = mc.confirmDialog(
             title="The Conbo Mouth Shape(s) Exist",
             message=f"It seems, the combo mouth shapes exist. Are you sure you want to re-create them? The modification will be lost.",
@@ -524,7 +853,10 @@ def _create_combo_shapes(side):
             return
         else:
             for combo_shape in combo_shapes:
-                mc.delete(combo_shape)
+                if mc.objExists(combo_shape):
+                    mc.delete(combo_shape)
+                if sparse_shapes.is_stored(combo_shape):
+                    mc.delete(sparse_shapes.get_sparse_delta_node(combo_shape))
 
     # get the position for the combo shapes
     combo_position = []
@@ -560,6 +892,10 @@ def _create_combo_shapes(side):
         
         i += 1
 
+    if not live:
+        _write_combo_shapes(side, combo_position, sparse)
+        return
+
     # making combo shapes and position them
     i = 0
     for combo_shape in combo_shapes:
@@ -575,25 +911,34 @@ def _create_combo_shapes(side):
     _get_combo_shapes(side)
 
 
-def make_combo_shapes():
+def make_combo_shapes(live=True, sparse=False):
 
-    _create_combo_shapes("Left")
+    _create_combo_shapes("Left", live, sparse)
 
 
 
+def _shape_exists(shape):
+    '''
+    the shape is in the scene as a mesh or kept as a sparse delta
+    '''
+    return mc.objExists(shape) or sparse_shapes.is_stored(shape)
+
+
 def mirror_mouth_corner_shapes():
 
-    # check if the mouth corner shapes exist
-    if not all(map(mc.objExists, MOUTH_CORNER_LF_NAMES)):
+    materialize_mouth_corner_shapes(MOUTH_CORNER_LF_NAMES + MOUTH_CORNER_LF_COMBO_NAMES)
+
+    # check if the mouth corner shapes exist, as meshes or kept as sparse deltas
+    if not all(map(_shape_exists, MOUTH_CORNER_LF_NAMES)):
         om.MGlobal.displayError(f"The objects '{MOUTH_CORNER_LF_NAMES}' doesn't exist. Please, rename the model as '{MOUTH_CORNER_LF_NAMES}'")
         return
 
-    if not all(map(mc.objExists, MOUTH_CORNER_LF_COMBO_NAMES)):
+    if not all(map(_shape_exists, MOUTH_CORNER_LF_COMBO_NAMES)):
         om.MGlobal.displayError(f"The objects '{MOUTH_CORNER_LF_COMBO_NAMES}' doesn't exist. Please, rename the model as '{MOUTH_CORNER_LF_COMBO_NAMES}'")
         return
 
     # checking if the mouth corner shapes already in the scene
-    if any(map(mc.objExists, MOUTH_CORNER_RT_NAMES)):
+    if any(map(_shape_exists, MOUTH_CORNER_RT_NAMES)):
         button = mc.confirmDialog(
             title="The Mouth Shape(s) Exist",
             message=f"It seems, the mouth corner shapes for right side exist. Are you sure you want to re-create them? The modification will be lost.",
@@ -606,7 +951,15 @@ def mirror_mouth_corner_shapes():
             return
         else:
             for mouth_shape in MOUTH_CORNER_RT_NAMES:
-                mc.delete(mouth_shape)
+                if mc.objExists(mouth_shape):
+                    mc.delete(mouth_shape)
+                if sparse_shapes.is_stored(mouth_shape):
+                    mc.delete(sparse_shapes.get_sparse_delta_node(mouth_shape))
+
+    symmetry_map = symmetry_tools.get_symmetry_map(head_cut.HEAD_GEOMETRY)
+
+    if symmetry_map is None:
+        return
 
     model_width_bbox = math.ceil(_get_head_bbox()[5])
 
@@ -621,32 +974,67 @@ def mirror_mouth_corner_shapes():
 
         mc.xform(mirrored_shape, ws=True, t=[mirrored_shape_x, mirrored_shape_y, mirrored_shape_z])
 
+        # the points are flipped in one bulk read and write
+        symmetry_tools.mirror_shape(shape_to_mirror, mirrored_shape[0], symmetry_map, flip=True)
+
     _create_combo_shapes("Right")
 
 
 def flip_shapes():
     '''
-    flip the shapes
+    flip the selected shapes
+    the symmetry map of the head is built once and reused for every shape
     '''
-    symmetry_script_path = os.path.join(
-        os.path.dirname(__file__), 'mel', 'symmetry.mel')
+    shapes_selected = mc.ls(selection=True, type='transform')
+
+    if not shapes_selected:
+        om.MGlobal.displayError("Please select the shapes you'd like to flip")
+        return
+
+    symmetry_map = symmetry_tools.get_symmetry_map(head_cut.HEAD_GEOMETRY)
+
+    if symmetry_map is None:
+        return
+
+    # one undo step for all the shapes
+    mc.undoInfo(openChunk=True, chunkName="flip_shapes")
+    try:
+        for shape in shapes_selected:
+            symmetry_tools.mirror_shape(shape, shape, symmetry_map, flip=True)
+    finally:
+        mc.undoInfo(closeChunk=True)
 
-    symmetry_script_path = os.path.normpath(symmetry_script_path)
-    symmetry_script_path = symmetry_script_path.replace('\\', '\\\\')
+    mc.select(shapes_selected)
 
-    mel.eval(f'source "{symmetry_script_path}"')
 
+def get_sculpted_verts(tolerance=0.001):
+    '''
+    moved vertices of every mouth corner and combo shape in the scene compared to the head
+    returns {shape: [vertex components]}
+    '''
+    shapes = MOUTH_CORNER_LF_NAMES + MOUTH_CORNER_RT_NAMES + MOUTH_CORNER_LF_COMBO_NAMES + MOUTH_CORNER_RT_COMBO_NAMES
+
+    sculpted_verts = {}
+    for shape in shapes:
+        if mc.objExists(shape):
+            sculpted_verts[shape] = symmetry_tools.get_moved_verts(shape, head_cut.HEAD_GEOMETRY, tolerance)
+
+    return sculpted_verts
 
-def make_soft_cluster():
 
+def make_soft_cluster(weighted_pivot=False):
+    '''
+    make a cluster from the soft selection
+    the pivot is the centre of the selected verts,
+    weighted_pivot uses the centre of the soft selection weighted by its weights
+    '''
     selectionVrts = mc.ls(selection = True, flatten = True)
 
     if selectionVrts:
 
         posVtx = _get_average(selectionVrts)
         mc.softSelect(sse=True)
-        softElementData = _soft_selection()
-        selection = ["%s.vtx[%d]" % (el[0], el[1])for el in softElementData ] 
+        softElementData = _soft_selection_arrays()
 
         #my edit to delete Shape from the name of the cluster, because of annotation it takes the Shape
         if selectionVrts[0].find("Shape"):
@@ -654,79 +1042,243 @@ def make_soft_cluster():
             print(selectionVrts[0])
 
         model = selectionVrts[0].split('.')[0]
-        mc.select(model, r=True)
-        cluster = mc.cluster(name = '%s_cls' % model, relative=False, bindState = True)
-        clusterGrp = mc.createNode('transform', name = '%s_grp' % cluster[1])
-        mc.xform(cluster, rotatePivot = posVtx, scalePivot = posVtx, objectSpace = True)
-        mc.xform(clusterGrp, rotatePivot = posVtx, scalePivot = posVtx, objectSpace = True)
-        mc.parent(cluster[1], clusterGrp)
-        mc.connectAttr('%s.worldInverseMatrix' % clusterGrp, '%s.bindPreMatrix' % cluster[0])
-        weight = [0.0]
-        zero = 0.0
-        VertexNb = mc.polyEvaluate(model, v=1) - 1
-
-        for x in range(VertexNb):
-            weight.append(zero)
-
-        mc.setAttr('{0}.weightList[0].weights[0:{1}]'.format(cluster[0], VertexNb), *weight, size=len(weight))
-        shape = mc.listRelatives(cluster[1], shapes = True)[0]
-        mc.setAttr('%s.originX' % shape, posVtx[0])
-        mc.setAttr('%s.originY' % shape, posVtx[1])
-        mc.setAttr('%s.originZ' % shape, posVtx[2])
-
-        for i in range(len(softElementData)):
-            mc.percent(cluster[0], selection[i], v=softElementData[i][2])
+
+        if weighted_pivot:
+            posVtx = _get_soft_average(softElementData, model) or posVtx
+
+        # the whole weight list is written at once instead of mc.percent per vertex
+        weights = _get_soft_weights(softElementData, model, mesh_cache.get_vertex_count(model))
+        cluster = _create_soft_cluster(model, posVtx, weights)
 
         mc.select(cluster[1], r=True)
 
 
-def _soft_selection():
+def _create_soft_cluster(model, pivot, weights):
+    '''
+    cluster on the whole model with its pivot and origin at the pivot
+    and the dense weight list set in one go
+    '''
+    mc.select(model, r=True)
+    cluster = mc.cluster(name = '%s_cls' % model, relative=False, bindState = True)
+    clusterGrp = mc.createNode('transform', name = '%s_grp' % cluster[1])
+    mc.xform(cluster, rotatePivot = pivot, scalePivot = pivot, objectSpace = True)
+    mc.xform(clusterGrp, rotatePivot = pivot, scalePivot = pivot, objectSpace = True)
+    mc.parent(cluster[1], clusterGrp)
+    mc.connectAttr('%s.worldInverseMatrix' % clusterGrp, '%s.bindPreMatrix' % cluster[0])
+    shape = mc.listRelatives(cluster[1], shapes = True)[0]
+    mc.setAttr('%s.originX' % shape, pivot[0])
+    mc.setAttr('%s.originY' % shape, pivot[1])
+    mc.setAttr('%s.originZ' % shape, pivot[2])
 
-    selection = om.MSelectionList()
-    softSelection = om.MRichSelection()
-    om.MGlobal.getRichSelection(softSelection)
-    softSelection.getSelection(selection)
-    dagPath = om.MDagPath()
-    component = om.MObject()
-    iter = om.MItSelectionList( selection,om.MFn.kMeshVertComponent )
-    elements = []
+    _set_cluster_weights(cluster[0], weights)
 
-    while not iter.isDone():
+    return cluster
 
-        iter.getDagPath( dagPath, component )
-        dagPath.pop()
-        node = dagPath.fullPathName()
-        fnComp = om.MFnSingleIndexedComponent(component)
 
-        for i in range(fnComp.elementCount()):
-            elements.append([node, fnComp.element(i), fnComp.weight(i).influence()] )
+def make_soft_cluster_headless(model, seed_vertices, radius, falloff_mode=soft_falloff.VOLUME, control_points=None, weighted_pivot=False):
+    '''
+    make the soft cluster without the soft selection and ssBuddy
+    the weights are computed from the points of the model:
+    volume - straight line distance, surface - distance along the edges
+    control_points is the ssBuddy falloff curve, a straight line if None
+    '''
+    if not mc.objExists(model):
+        om.MGlobal.displayError(f"The object '{model}' doesn't exist.")
+        return
 
-        iter.next()
+    if falloff_mode not in soft_falloff.FALLOFF_MODES:
+        om.MGlobal.displayError(f"Unknown falloff mode '{falloff_mode}', please use one of {soft_falloff.FALLOFF_MODES}")
+        return
 
-    return elements
+    seed_vertices = np.atleast_1d(np.asarray(seed_vertices, dtype=np.int64))
+    points = mesh_io.get_points(model, world_space=True)
+
+    adjacency = None
+    if falloff_mode == soft_falloff.SURFACE:
+        adjacency = mesh_cache.get_adjacency(model)
+
+    indices, soft_weights = soft_falloff.compute_soft_weights(
+        points,
+        seed_vertices,
+        radius,
+        falloff_mode,
+        control_points,
+        adjacency
+    )
+
+    if weighted_pivot:
+        pivot = np.average(points[indices], axis=0, weights=soft_weights).tolist()
+    else:
+        pivot = points[seed_vertices].mean(axis=0).tolist()
+
+    weights = np.zeros(len(points), dtype=np.float64)
+    weights[indices] = soft_weights
+
+    cluster = _create_soft_cluster(model, pivot, weights)
+
+    mc.select(cluster[1], r=True)
+
+    return cluster
+
+
+def regenerate_soft_clusters(cluster_settings, control_points=None):
+    '''
+    rebuild the soft clusters in one batch
+    cluster_settings: [{'model': ..., 'seed_vertices': [...], 'radius': ..., 'falloff_mode': ...}, ...]
+    the existing clusters of the models are deleted first
+    '''
+    clusters = []
+
+    for settings in cluster_settings:
+        model = settings['model']
+        cluster_handle = f"{model}_clsHandle"
+
+        if mc.objExists(f"{cluster_handle}_grp"):
+            mc.delete(f"{cluster_handle}_grp")
+
+        cluster = make_soft_cluster_headless(
+            model,
+            settings['seed_vertices'],
+            settings['radius'],
+            settings.get('falloff_mode', soft_falloff.VOLUME),
+            settings.get('control_points', control_points),
+            settings.get('weighted_pivot', False)
+        )
+
+        if cluster:
+            clusters.append(cluster)
+
+    return clusters
 
-def _get_average(selection):
 
-    average = []
-    listX = []
-    listY = []
-    listZ = []
+def _get_soft_weights(soft_selections, model, vertex_count):
+    '''
+    dense weight list of the model from the soft selection, zero for the unselected vertices
+    '''
+    weights = np.zeros(vertex_count, dtype=np.float64)
+
+    for soft_selection in soft_selections:
+        if soft_selection.node.rsplit('|', 1)[-1] == model:
+            weights[soft_selection.indices] = soft_selection.weights
+
+    return weights
+
+
+def _set_cluster_weights(cluster, weights):
+    '''
+    set the weights of all the vertices with one setAttr
+    '''
+    mc.setAttr(f"{cluster}.weightList[0].weights[0:{len(weights) - 1}]", *weights.tolist(), size=len(weights))
+
+
+def _set_cluster_weights_per_vertex(cluster, model, weights):
+    '''
+    the old way, one mc.percent per weighted vertex, kept for the timing comparison
+    '''
+    mc.setAttr(f"{cluster}.weightList[0].weights[0:{len(weights) - 1}]", *[0.0] * len(weights), size=len(weights))
+
+    for index in np.flatnonzero(weights):
+        mc.percent(cluster, f"{model}.vtx[{index}]", v=weights[index])
+
+
+def compare_soft_cluster_weight_timing(cluster=None):
+    '''
+    time the per vertex mc.percent weights against the bulk setAttr on the current soft selection
+    the soft cluster ends up with the bulk weights
+    returns (per vertex seconds, bulk seconds)
+    '''
+    selectionVrts = mc.ls(selection=True, flatten=True)
+
+    if not selectionVrts:
+        om.MGlobal.displayError("Please select the vertex the soft selection is made from")
+        return
+
+    model = selectionVrts[0].split('.')[0].replace("Shape", "")
+
+    if cluster is None:
+        cluster = f"{model}_cls"
+
+    if not mc.objExists(cluster):
+        om.MGlobal.displayError(f"The cluster '{cluster}' doesn't exist. Please, create the soft cluster first")
+        return
+
+    weights = _get_soft_weights(_soft_selection_arrays(), model, mesh_cache.get_vertex_count(model))
+
+    start = time.perf_counter()
+    _set_cluster_weights_per_vertex(cluster, model, weights)
+    per_vertex_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    _set_cluster_weights(cluster, weights)
+    bulk_time = time.perf_counter() - start
+
+    print(f"{np.count_nonzero(weights)} weighted vertices: mc.percent {per_vertex_time:.3f}s, bulk setAttr {bulk_time:.3f}s")
+
+    return per_vertex_time, bulk_time
+
+
+def _soft_selection_arrays():
+    '''
+    rich selection as one SoftSelection(node, int32 ids, float32 weights) per mesh
+    the ids come from one getElements call, the API has no bulk weight getter
+    so the weights are streamed straight into the array
+    '''
+    selection = om2.MGlobal.getRichSelection().getSelection()
+    soft_selections = []
 
-    for item in selection:
+    for i in range(selection.length()):
+        dag_path, component = selection.getComponent(i)
 
-        pos = mc.xform(item, query = True, translation = True, worldSpace = True)
-        listX.append(pos[0])
-        listY.append(pos[1])
-        listZ.append(pos[2])
+        if component.isNull() or component.apiType() != om2.MFn.kMeshVertComponent:
+            continue
 
-    aveX = reduce(lambda x, y: x + y, listX) / len(listX)
-    aveY = reduce(lambda x, y: x + y, listY) / len(listY)
-    aveZ = reduce(lambda x, y: x + y, listZ) / len(listZ)
-    average.append(aveX)
-    average.append(aveY)
-    average.append(aveZ)
+        dag_path.pop()
+        fn_component = om2.MFnSingleIndexedComponent(component)
+        element_count = fn_component.elementCount
 
-    return average
+        indices = np.array(fn_component.getElements(), dtype=np.int32)
+
+        if fn_component.hasWeights:
+            weights = np.fromiter(
+                (fn_component.weight(element).influence for element in range(element_count)),
+                dtype=np.float32,
+                count=element_count
+            )
+        else:
+            weights = np.ones(element_count, dtype=np.float32)
+
+        soft_selections.append(SoftSelection(dag_path.fullPathName(), indices, weights))
+
+    return soft_selections
+
+
+def _soft_selection():
+    '''
+    rich selection as [node, vertex id, weight] lists
+    '''
+    return [
+        [soft_selection.node, int(index), float(weight)]
+        for soft_selection in _soft_selection_arrays()
+        for index, weight in zip(soft_selection.indices, soft_selection.weights)
+    ]
+
+
+def _get_average(selection):
+    '''
+    centroid of the selected components, read in one query
+    '''
+    return mesh_io.get_centroid(selection).tolist()
+
+
+def _get_soft_average(soft_selections, model):
+    '''
+    centroid of the soft selection weighted by the soft selection weights
+    '''
+    for soft_selection in soft_selections:
+        if soft_selection.node.rsplit('|', 1)[-1] == model:
+            return mesh_io.get_weighted_centroid(model, soft_selection.indices, soft_selection.weights).tolist()
+
+    return None
     
 
 def _delete_control(ctl, side):
@@ -885,8 +1437,9 @@ def connect_control_to_face():
     obj_selected[0] = vert_lf
     obj_selected[2] = vert_rt
 
-    _glueControl(obj_selected[:2])
-    _glueControl(obj_selected[2:])
+    # both controls are glued in one undo chunk with one uv table lookup
+    if follicles.attach_controls([(vert_lf, ctl_lf), (vert_rt, ctl_rt)], vert_lf.split('.')[0]) is None:
+        return
 
     _put_control_under_motion(ctl_lf)
     _put_control_under_motion(ctl_rt)
@@ -904,68 +1457,6 @@ def _put_control_under_motion(ctl):
     mc.parent(top_parent, structure.CONTROLS_GROUP[0])
 
 
-def _glueControl(selection):
-    
-    if len(selection) == 2:
-        
-        #virables
-        vertex = selection[0]
-        vertex_id = int(selection[0].split('[')[1][:-1])
-        mesh = selection[0].split('.')[0]
-        name = selection[1][:-4]
-        
-        #snap the control to the right location
-        vert_pos = mc.xform(vertex, q=True, t=True, ws=True)
-        mc.xform('%s_grp' % name, t = vert_pos, ws = True)
-        
-        #create follicle
-        fol = _createFollicle('%s_fol' % name, mesh, vertex_id, parent = None)
-
-        #put follicle under Follicle_grp and make it hidden
-        mc.parent(fol[0], structure.DONT_GROUP[4])
-        mc.setAttr(f"{fol[0]}.visibility", 0)
-        
-        #attach the control to the follcle
-        mc.pointConstraint(fol[0], '%s_sdk' % name)
-        
-        
-        #negate control
-        _negateControl('%s_ctl' % name)
-
-
-def _createFollicle(name, mesh, vertex, parent = None):
-    follicle = name
-    follicleShape = mc.createNode('follicle', n='%sShape' % name)
-    mc.connectAttr('%s.outMesh' % mesh, '%s.inputMesh' % follicleShape)
-    mc.connectAttr('%s.worldMatrix[0]' % mesh, '%s.inputWorldMatrix' % follicleShape)
-    mc.connectAttr('%s.outRotate' % follicleShape, '%s.rotate' % follicle)
-    mc.connectAttr('%s.outTranslate' % follicleShape, '%s.translate' % follicle)
-    uv = _getUVFromVertexIndex(mesh, vertex)
-    mc.setAttr('%s.parameterU' % follicleShape, uv[0])
-    mc.setAttr('%s.parameterV' % follicleShape, uv[1])
-    if parent:
-        mc.parent(follicle, parent)
-    return follicle, follicleShape
-    
-
-def _getUVFromVertexIndex(mesh, vertex):
-    mc.select('%s.vtx[%s]' % (mesh, vertex), r = True)
-    mc.ConvertSelectionToUVs()
-    uvs = mc.polyEditUV(q=True)
-    mc.select(clear = True)
-    return uvs[0], uvs[1]
-
-
-def _negateControl(ctrl):
-    parentNode = mc.listRelatives(ctrl, p = True)
-    if parentNode:
-        trnMultiplyDivide = mc.createNode('multiplyDivide', name = '%s_neg_md' % ctrl)
-        for letter in ['X','Y','Z']:
-            mc.connectAttr('%s.translate%s' % (ctrl, letter), '%s.input1%s' % (trnMultiplyDivide, letter))
-            mc.connectAttr('%s.output%s' % (trnMultiplyDivide, letter), '%s.translate%s' % (parentNode[0], letter))
-            mc.setAttr('%s.input2%s' % (trnMultiplyDivide, letter), -1)
-
-
 def put_ready_shapes_under_shapes_group():
     pass
 
@@ -0,0 +1,38 @@
+from maya.api import OpenMaya as om2
+
+from facial_rig_toolset import api_undo
+
+
+def maya_useNewAPI():
+    pass
+
+
+class ApiUndoCommand(om2.MPxCommand):
+    '''
+    undo step of an API edit done outside the command, see api_undo.commit
+    '''
+
+    def __init__(self):
+        om2.MPxCommand.__init__(self)
+        self._undo = None
+        self._redo = None
+
+    def doIt(self, args):
+        self._undo, self._redo = api_undo.take_pending()
+
+    def undoIt(self):
+        self._undo()
+
+    def redoIt(self):
+        self._redo()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    om2.MFnPlugin(plugin).registerCommand(api_undo.COMMAND, ApiUndoCommand)
+
+
+def uninitializePlugin(plugin):
+    om2.MFnPlugin(plugin).deregisterCommand(api_undo.COMMAND)
@@ -128,6 +128,9 @@ class SubWindow(QWidget):
         self.button_check_symmetry = QPushButton("Check Symmetry")
         self.button_check_symmetry.setToolTip("Select the model to check if it is symmetrical")
 
+        self.button_symmetry_tools = QPushButton("Symmetry Tools")
+        self.button_symmetry_tools.setToolTip("Open abSymMesh to mirror, flip, revert, add/subtract and symmetrize shapes")
+
         self.button_assign_material = QPushButton("Assign Material")
         self.button_assign_material.setToolTip("Select the faces to assign the material")
 
@@ -250,12 +253,12 @@ class SubWindow(QWidget):
 
         self.button_right_side_shapes = QPushButton("Right Side Shapes")
         self.button_right_side_shapes.setToolTip(
-            "<div>Make Combo Shapes for the mouth shapes on the left side</div>")
+            "<div>Make the right side mouth shapes flipped from the left side and their Combo Shapes</div>")
         self.button_right_side_shapes.setStyleSheet('QToolTip { min-width: 300px; }')
 
         self.button_flip_shapes = QPushButton("Flip Selected Shapes")
         self.button_flip_shapes.setToolTip(
-            "<div>Flip selected mouth shapes on the left side</div>"
+            "<div>Flip selected mouth shapes</div>"
             "<div><b>!IMPORTANT!</b> Don't select <b>combo</b> shapes</div>")
         self.button_flip_shapes.setStyleSheet('QToolTip { min-width: 300px; }')
 
@@ -324,6 +327,7 @@ class SubWindow(QWidget):
 
         layout.addWidget(self.button_model_check)
         layout.addWidget(self.button_check_symmetry)
+        layout.addWidget(self.button_symmetry_tools)
 
 
         layout = QVBoxLayout(self.group_box_assign_material)
@@ -391,6 +395,7 @@ class SubWindow(QWidget):
     def _init_signals(self):
         self.button_model_check.clicked.connect(self._on_button_model_check_clicked)
         self.button_check_symmetry.clicked.connect(self._on_button_check_symmetry_clicked)
+        self.button_symmetry_tools.clicked.connect(self._on_button_symmetry_tools_clicked)
 
         self.button_assign_material.clicked.connect(self._on_button_assign_material_clicked)
 
@@ -600,6 +605,14 @@ class SubWindow(QWidget):
             om.MGlobal.displayError(str(e))
 
 
+    def _on_button_symmetry_tools_clicked(self):
+        try:
+            model_check.open_symmetry_tools()
+
+        except RuntimeError as e:
+            om.MGlobal.displayError(str(e))
+
+
     def _on_button_assign_material_clicked(self):
         try:
             face_part = self.combo_box_assing_material.currentText().lower()
@@ -0,0 +1,194 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from facial_rig_toolset import sparse_delta
+
+
+MAGIC = b"FRTSHAPE"
+VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 16
+EXTENSION = ".shapes"
+
+SHAPE = "shape"
+MASK = "mask"
+COMBO = "combo"
+
+
+def _padding(size):
+    return -size % ALIGNMENT
+
+
+def save_shape_library(path, sparse_deltas, kinds=None, positions=None, compress=False):
+    '''
+    write {name: SparseDelta} into one binary file
+    a JSON header lists the shapes, their kind, position and where their arrays are,
+    then every shape has its int32 vertex ids and float32 offsets, each block zlib compressed if compress
+    '''
+    kinds = kinds or {}
+    positions = positions or {}
+
+    vertex_counts = {shape_delta.vertex_count for shape_delta in sparse_deltas.values()}
+    if len(vertex_counts) > 1:
+        raise ValueError(f"The shapes are made for different vertex counts {sorted(vertex_counts)}")
+
+    blocks = []
+    entries = []
+    data_offset = 0
+
+    for name, shape_delta in sparse_deltas.items():
+        entry = {
+            "name": name,
+            "kind": kinds.get(name, SHAPE),
+            "count": len(shape_delta),
+            "position": [float(value) for value in positions.get(name, [0, 0, 0])],
+        }
+
+        for key, array in (("indices", shape_delta.indices), ("offsets", shape_delta.offsets)):
+            data = array.tobytes()
+            if compress:
+                data = zlib.compress(data)
+            entry[key] = [data_offset, len(data)]
+            blocks.append(data + b"\0" * _padding(len(data)))
+            data_offset += len(data) + _padding(len(data))
+
+        entries.append(entry)
+
+    header = json.dumps({
+        "vertex_count": vertex_counts.pop() if vertex_counts else 0,
+        "compressed": bool(compress),
+        "shapes": entries,
+    }).encode("utf-8")
+    header += b" " * _padding(PREAMBLE.size + len(header))
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    with open(path, "wb") as library_file:
+        library_file.write(PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        library_file.write(header)
+        for block in blocks:
+            library_file.write(block)
+
+
+class ShapeLibrary(object):
+    '''
+    shape library file opened for reading
+    only the header is read up front, the arrays of a shape are memory-mapped
+    (or decompressed) when the shape is asked for
+    '''
+
+    def __init__(self, path):
+
+        self.path = path
+
+        with open(path, "rb") as library_file:
+            preamble = library_file.read(PREAMBLE.size)
+            if len(preamble) != PREAMBLE.size:
+                raise ValueError(f"'{path}' isn't a shape library")
+
+            magic, version, header_length = PREAMBLE.unpack(preamble)
+
+            if magic != MAGIC:
+                raise ValueError(f"'{path}' isn't a shape library")
+            if version > VERSION:
+                raise ValueError(f"'{path}' is a version {version} shape library, only {VERSION} is supported")
+
+            header = library_file.read(header_length)
+            if len(header) != header_length:
+                raise ValueError(f"The header of the shape library '{path}' is cut off")
+
+            header = json.loads(header.decode("utf-8"))
+
+        self.vertex_count = header["vertex_count"]
+        self.compressed = header["compressed"]
+        self._data_start = PREAMBLE.size + header_length
+        self._entries = {entry["name"]: entry for entry in header["shapes"]}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    @property
+    def names(self):
+        return list(self._entries)
+
+    def get_names(self, kind=None):
+        return [name for name, entry in self._entries.items() if kind is None or entry["kind"] == kind]
+
+    def get_kind(self, name):
+        return self._entries[name]["kind"]
+
+    def get_position(self, name):
+        return self._entries[name]["position"]
+
+    def _read_array(self, block, dtype, count):
+
+        offset, size = block
+
+        if not count:
+            return np.zeros(0, dtype=dtype)
+
+        if not self.compressed:
+            return np.memmap(self.path, dtype=dtype, mode="r", offset=self._data_start + offset, shape=(count,))
+
+        with open(self.path, "rb") as library_file:
+            library_file.seek(self._data_start + offset)
+            try:
+                return np.frombuffer(zlib.decompress(library_file.read(size)), dtype=dtype)
+            except zlib.error as e:
+                raise ValueError(f"A block of the shape library '{self.path}' can't be read: {e}")
+
+    def get(self, name):
+        '''
+        SparseDelta of the shape
+        '''
+        entry = self._entries[name]
+
+        return sparse_delta.SparseDelta(
+            self._read_array(entry["indices"], np.int32, entry["count"]),
+            self._read_array(entry["offsets"], np.float32, entry["count"] * 3),
+            self.vertex_count
+        )
+
+    def get_points(self, name, base):
+        '''
+        rebuild the shape points on the base points
+        '''
+        return self.get(name).apply(base)
+
+
+def compare_shape_libraries(path_a, path_b, tolerance=sparse_delta.DEFAULT_TOLERANCE):
+    '''
+    what changed between two libraries without opening Maya
+    returns (only in a, only in b, {shape: largest vertex difference} for the shapes that differ)
+    '''
+    library_a = ShapeLibrary(path_a)
+    library_b = ShapeLibrary(path_b)
+
+    changed = {}
+    for name in library_a.names:
+        if name not in library_b:
+            continue
+
+        if library_a.vertex_count != library_b.vertex_count:
+            changed[name] = np.inf
+            continue
+
+        difference = library_a.get(name).to_dense() - library_b.get(name).to_dense()
+        largest = float(np.linalg.norm(difference, axis=1).max()) if library_a.vertex_count else 0.0
+
+        if largest > tolerance:
+            changed[name] = largest
+
+    only_a = [name for name in library_a.names if name not in library_b]
+    only_b = [name for name in library_b.names if name not in library_a]
+
+    return only_a, only_b, changed
@@ -0,0 +1,199 @@
+from importlib import reload
+
+import numpy as np
+
+import maya.cmds as mc
+from maya import OpenMaya as om
+from maya.api import OpenMaya as om2
+from maya.api import OpenMayaAnim as oma2
+
+from facial_rig_toolset import api_undo
+from facial_rig_toolset import mesh_io
+from facial_rig_toolset import skin_weights
+reload(api_undo)
+reload(mesh_io)
+reload(skin_weights)
+
+
+def _get_skin_fn(skin_cluster):
+    selection = om2.MSelectionList()
+    selection.add(skin_cluster)
+
+    return oma2.MFnSkinCluster(selection.getDependNode(0))
+
+
+def _get_vertex_component(skin_fn, vertex_ids=None):
+    '''
+    dag path of the skinned mesh and its vertex component, every vertex if vertex_ids is None
+    '''
+    dag_path = skin_fn.getPathAtIndex(0)
+    component_fn = om2.MFnSingleIndexedComponent()
+    component = component_fn.create(om2.MFn.kMeshVertComponent)
+
+    if vertex_ids is None:
+        component_fn.setCompleteData(om2.MFnMesh(dag_path).numVertices)
+    else:
+        component_fn.addElements(om2.MIntArray(np.asarray(vertex_ids, dtype=np.int64).tolist()))
+
+    return dag_path, component
+
+
+def get_influences(skin_cluster):
+    '''
+    influence names in the order of the weight columns
+    '''
+    return [dag_path.partialPathName() for dag_path in _get_skin_fn(skin_cluster).influenceObjects()]
+
+
+def get_joint_labels(joints):
+    '''
+    the side/type/otherType labels set by body_head_blend.label_joints()
+    '''
+    labels = []
+    for joint in joints:
+        if not mc.attributeQuery("side", node=joint, exists=True):
+            labels.append((None, joint))
+            continue
+        labels.append(skin_weights.get_label(
+            mc.getAttr(f"{joint}.side"),
+            mc.getAttr(f"{joint}.type"),
+            mc.getAttr(f"{joint}.otherType") or ""
+        ))
+
+    return labels
+
+
+def get_weights(skin_cluster, vertex_ids=None):
+    '''
+    (vertices, influences) weight matrix in one getWeights call
+    '''
+    skin_fn = _get_skin_fn(skin_cluster)
+    dag_path, component = _get_vertex_component(skin_fn, vertex_ids)
+    weights, influence_count = skin_fn.getWeights(dag_path, component)
+
+    return np.array(weights, dtype=np.float64).reshape(-1, influence_count)
+
+
+def get_sparse_weights(skin_cluster, vertex_ids=None, threshold=0.0):
+    '''
+    get_weights kept as skin_weights.SparseWeights, only the weights bigger than the threshold
+    '''
+    return skin_weights.SparseWeights.from_dense(get_weights(skin_cluster, vertex_ids), threshold)
+
+
+def _set_weight_blocks(skin_cluster, blocks):
+    '''
+    one setWeights call per (vertex ids, influence ids, flat weights) block
+    returns the blocks with the weights they replaced
+    '''
+    skin_fn = _get_skin_fn(skin_cluster)
+    old_blocks = []
+
+    for vertex_ids, influences, weights in blocks:
+        dag_path, component = _get_vertex_component(skin_fn, vertex_ids)
+        old_weights = skin_fn.setWeights(
+            dag_path,
+            component,
+            om2.MIntArray(np.asarray(influences, dtype=np.int64).tolist()),
+            om2.MDoubleArray(np.asarray(weights, dtype=np.float64).ravel().tolist()),
+            False,
+            True
+        )
+        old_blocks.append((vertex_ids, influences, np.array(old_weights, dtype=np.float64)))
+
+    return old_blocks
+
+
+def _write_weights(skin_cluster, blocks):
+    '''
+    write the weight blocks as one undo step, undo writes back the weights they replaced
+    '''
+    old_blocks = _set_weight_blocks(skin_cluster, blocks)
+
+    api_undo.commit(
+        lambda: _set_weight_blocks(skin_cluster, old_blocks[::-1]),
+        lambda: _set_weight_blocks(skin_cluster, blocks)
+    )
+
+
+def set_weights(skin_cluster, weights, vertex_ids=None):
+    '''
+    write the (vertices, influences) weight matrix in one setWeights call, it can be undone
+    '''
+    weights = np.asarray(weights, dtype=np.float64)
+
+    _write_weights(skin_cluster, [(vertex_ids, np.arange(weights.shape[1]), weights)])
+
+
+def set_sparse_weights(skin_cluster, weights, vertex_ids=None, previous_weights=None):
+    '''
+    write skin_weights.SparseWeights as its non-zero weights only, it can be undone
+    previous_weights, the SparseWeights of the same vertices before, adds the zeros where a weight is cleared
+    every influence is one setWeights call on the vertices it has a weight to write for
+    '''
+    rows, influences, values = skin_weights.get_write_entries(weights, previous_weights)
+    if not len(rows):
+        return
+
+    vertex_ids = rows if vertex_ids is None else np.asarray(vertex_ids, dtype=np.int64)[rows]
+    used_influences, starts = np.unique(influences, return_index=True)
+    stops = np.append(starts[1:], len(rows))
+
+    _write_weights(skin_cluster, [
+        (vertex_ids[start:stop], [influence], values[start:stop])
+        for influence, start, stop in zip(used_influences.tolist(), starts, stops)
+    ])
+
+
+def transfer_skin_weights(source_mesh, source_skin, target_mesh, target_skin, vertex_ids=None, max_distance=None,
+                          max_influences=None, threshold=skin_weights.PRUNE_THRESHOLD, vertex_map=None):
+    '''
+    copySkinWeights -ia "label" with bulk reads and writes
+    the influences are matched by joint label, the vertices by the closest source vertex
+    or by vertex_map, the source vertex id of every target vertex (-1 for none) when the meshes share vertices
+    vertex_ids limits the target vertices, max_distance leaves the target vertices further from their source vertex alone,
+    with vertex_map as well
+    the weights are kept sparse: pruned below the threshold and limited to max_influences per vertex,
+    only the source vertices that are mapped are read and only the influences in use are written
+    returns the transferred target vertex ids
+    '''
+    source_influences = get_influences(source_skin)
+    target_influences = get_influences(target_skin)
+
+    influence_map = skin_weights.map_influences(get_joint_labels(source_influences), get_joint_labels(target_influences))
+
+    if vertex_ids is None:
+        vertex_ids = np.arange(mesh_io.get_vertex_count(target_mesh))
+    # the component lists the vertices sorted, so the weight rows are too
+    vertex_ids = np.unique(np.asarray(vertex_ids, dtype=np.int64))
+
+    if vertex_map is None:
+        target_points = mesh_io.get_points(target_mesh, world_space=True)[vertex_ids]
+        vertex_map = skin_weights.map_vertices(mesh_io.get_points(source_mesh, world_space=True), target_points, max_distance)
+    else:
+        vertex_map = np.asarray(vertex_map, dtype=np.int64)[vertex_ids]
+        if max_distance is not None:
+            mapped = vertex_map >= 0
+            offsets = mesh_io.get_points(source_mesh, world_space=True)[vertex_map[mapped]] - mesh_io.get_points(target_mesh, world_space=True)[vertex_ids[mapped]]
+            vertex_map[np.flatnonzero(mapped)[np.linalg.norm(offsets, axis=1) > max_distance]] = -1
+
+    if not (vertex_map >= 0).any():
+        return vertex_ids[:0]
+
+    source_ids, source_rows = np.unique(vertex_map[vertex_map >= 0], return_inverse=True)
+    vertex_map[vertex_map >= 0] = source_rows.ravel()
+
+    source_weights = get_sparse_weights(source_skin, source_ids)
+    target_weights = get_sparse_weights(target_skin, vertex_ids)
+
+    unmapped = [
+        source_influences[influence] for influence in source_weights.prune(threshold).used_influences
+        if influence_map[influence] < 0
+    ]
+    if unmapped:
+        om.MGlobal.displayWarning(f"The influences {unmapped} have no joint with the same label in '{target_skin}', their weights are dropped.")
+
+    new_weights = skin_weights.transfer_weights(source_weights, target_weights, vertex_map, influence_map, max_influences, threshold)
+    set_sparse_weights(target_skin, new_weights, vertex_ids, target_weights)
+
+    return vertex_ids[vertex_map >= 0]
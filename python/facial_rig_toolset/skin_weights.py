@@ -0,0 +1,234 @@
+import numpy as np
+
+from facial_rig_toolset import spatial
+
+
+OTHER_TYPE = 18
+PRUNE_THRESHOLD = 0.0001
+
+
+class SparseWeights(object):
+    '''
+    skin weights stored per vertex as its non-zero influences only, CSR style
+    the influences and weights of vertex v are influences[offsets[v]:offsets[v + 1]]
+    '''
+
+    def __init__(self, offsets, influences, weights, influence_count):
+
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.influences = np.asarray(influences, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.influence_count = int(influence_count)
+
+        if len(self.influences) != len(self.weights) or self.offsets[-1] != len(self.weights):
+            raise ValueError(f"{len(self.influences)} influences, {len(self.weights)} weights and {self.offsets[-1]} entries don't match")
+
+    @classmethod
+    def from_entries(cls, vertex_count, rows, influences, weights, influence_count):
+        '''
+        build from (vertex, influence, weight) entries in any order, repeated pairs are summed
+        '''
+        rows = np.asarray(rows, dtype=np.int64)
+        influences = np.asarray(influences, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+
+        keys, inverse = np.unique(rows * influence_count + influences, return_inverse=True)
+        summed = np.bincount(inverse.ravel(), weights=weights, minlength=len(keys))
+
+        keep = summed != 0
+        keys = keys[keep]
+        rows = keys // influence_count
+
+        offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=vertex_count), out=offsets[1:])
+
+        return cls(offsets, keys % influence_count, summed[keep], influence_count)
+
+    @classmethod
+    def from_dense(cls, dense, threshold=0.0):
+        '''
+        keep the weights bigger than the threshold of a (vertices, influences) matrix
+        '''
+        dense = np.asarray(dense, dtype=np.float64)
+        rows, influences = np.nonzero(dense > threshold)
+
+        offsets = np.zeros(dense.shape[0] + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=dense.shape[0]), out=offsets[1:])
+
+        return cls(offsets, influences, dense[rows, influences], dense.shape[1])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self):
+        return self.offsets.nbytes + self.influences.nbytes + self.weights.nbytes
+
+    @property
+    def rows(self):
+        '''
+        vertex of every stored weight
+        '''
+        return np.repeat(np.arange(len(self)), np.diff(self.offsets))
+
+    @property
+    def used_influences(self):
+        return np.unique(self.influences)
+
+    def to_dense(self, influences=None):
+        '''
+        (vertices, influences) matrix, only the columns of the given influences if there are some
+        '''
+        if influences is None:
+            influences = np.arange(self.influence_count)
+        influences = np.asarray(influences, dtype=np.int64)
+
+        columns = np.full(self.influence_count, -1, dtype=np.int64)
+        columns[influences] = np.arange(len(influences))
+
+        dense = np.zeros((len(self), len(influences)))
+        keep = columns[self.influences] >= 0
+        dense[self.rows[keep], columns[self.influences[keep]]] = self.weights[keep]
+
+        return dense
+
+    def _select(self, keep):
+
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(np.bincount(self.rows[keep], minlength=len(self)), out=offsets[1:])
+
+        return SparseWeights(offsets, self.influences[keep], self.weights[keep], self.influence_count)
+
+    def prune(self, threshold=PRUNE_THRESHOLD):
+        '''
+        drop the weights up to the threshold
+        '''
+        return self._select(self.weights > threshold)
+
+    def limit(self, max_influences):
+        '''
+        keep the max_influences biggest weights of every vertex
+        '''
+        rows = self.rows
+        order = np.lexsort((-self.weights, rows))
+        ranks = np.arange(len(order)) - self.offsets[rows[order]]
+
+        keep = np.zeros(len(order), dtype=bool)
+        keep[order[ranks < max_influences]] = True
+
+        return self._select(keep)
+
+    def normalize(self):
+        '''
+        every vertex with weights sums up to one
+        '''
+        totals = np.bincount(self.rows, weights=self.weights, minlength=len(self))
+        totals[totals == 0] = 1.0
+
+        return SparseWeights(self.offsets, self.influences, self.weights / np.repeat(totals, np.diff(self.offsets)), self.influence_count)
+
+    def gather(self, vertex_map):
+        '''
+        the weights of the vertex_map vertices as new rows, -1 makes an empty row
+        '''
+        vertex_map = np.asarray(vertex_map, dtype=np.int64)
+        counts = np.where(vertex_map >= 0, np.diff(self.offsets)[np.maximum(vertex_map, 0)], 0)
+
+        offsets = np.zeros(len(vertex_map) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        starts = np.repeat(self.offsets[np.maximum(vertex_map, 0)], counts)
+        entries = starts + np.arange(offsets[-1]) - np.repeat(offsets[:-1], counts)
+
+        return SparseWeights(offsets, self.influences[entries], self.weights[entries], self.influence_count)
+
+    def remap_influences(self, influence_map, influence_count):
+        '''
+        move the weights onto other influence ids, -1 drops them, weights landing on the same id are summed
+        '''
+        new_influences = np.asarray(influence_map, dtype=np.int64)[self.influences]
+        keep = new_influences >= 0
+
+        return SparseWeights.from_entries(len(self), self.rows[keep], new_influences[keep], self.weights[keep], influence_count)
+
+
+def get_write_entries(weights, previous_weights=None):
+    '''
+    the (vertex rows, influences, weights) to write, sorted by influence then vertex:
+    every non-zero weight, and a zero where previous_weights had a weight the new ones don't
+    '''
+    rows = weights.rows
+    influences = weights.influences.astype(np.int64)
+    values = weights.weights.astype(np.float64)
+
+    if previous_weights is not None:
+        keys = rows * weights.influence_count + influences
+        previous_keys = previous_weights.rows * weights.influence_count + previous_weights.influences
+        cleared = previous_keys[~np.isin(previous_keys, keys)]
+
+        rows = np.concatenate([rows, cleared // weights.influence_count])
+        influences = np.concatenate([influences, cleared % weights.influence_count])
+        values = np.concatenate([values, np.zeros(len(cleared))])
+
+    order = np.lexsort((rows, influences))
+
+    return rows[order], influences[order], values[order]
+
+
+def get_label(side, joint_type, other_type=""):
+    '''
+    the key copySkinWeights -ia "label" matches joints by: the side and the type,
+    the name typed in otherType for the 'Other' type
+    '''
+    return (int(side), other_type if joint_type == OTHER_TYPE else str(joint_type))
+
+
+def map_influences(source_labels, target_labels):
+    '''
+    target influence id of every source influence with the same label, -1 if the target has none
+    '''
+    target_ids = {}
+    for target_id, label in enumerate(target_labels):
+        target_ids.setdefault(label, target_id)
+
+    return np.array([target_ids.get(label, -1) for label in source_labels], dtype=np.int64)
+
+
+def map_vertices(source_points, target_points, max_distance=None):
+    '''
+    closest source vertex of every target vertex, -1 past max_distance
+    '''
+    return spatial.find_nearest(source_points, target_points, max_distance=max_distance)[0]
+
+
+def transfer_weights(source_weights, target_weights, vertex_map, influence_map, max_influences=None, threshold=PRUNE_THRESHOLD):
+    '''
+    gather the source weights of the mapped vertices onto the target influences
+    source_weights: SparseWeights of the source vertices
+    target_weights: SparseWeights of the target vertices
+    vertex_map: source vertex of every target vertex, -1 keeps the target weights
+    influence_map: target influence of every source influence, -1 drops its weight
+    the weights up to the threshold are pruned, max_influences limits the influences per vertex
+    the target vertices left without any weight keep theirs, the others are normalized
+    returns the new target SparseWeights
+    '''
+    vertex_map = np.asarray(vertex_map, dtype=np.int64)
+
+    gathered = source_weights.gather(vertex_map).remap_influences(influence_map, target_weights.influence_count)
+    gathered = gathered.prune(threshold)
+    if max_influences:
+        gathered = gathered.limit(max_influences)
+    gathered = gathered.normalize()
+
+    # the target keeps its own weights where nothing came over
+    from_source = np.diff(gathered.offsets) > 0
+    keep_target = ~from_source[target_weights.rows]
+    take_source = from_source[gathered.rows]
+
+    return SparseWeights.from_entries(
+        len(target_weights),
+        np.concatenate([target_weights.rows[keep_target], gathered.rows[take_source]]),
+        np.concatenate([target_weights.influences[keep_target], gathered.influences[take_source]]),
+        np.concatenate([target_weights.weights[keep_target], gathered.weights[take_source]]),
+        target_weights.influence_count
+    )
@@ -0,0 +1,140 @@
+import heapq
+
+import numpy as np
+
+from facial_rig_toolset import falloff_curve
+from facial_rig_toolset import spatial
+
+
+VOLUME = "volume"
+SURFACE = "surface"
+FALLOFF_MODES = [VOLUME, SURFACE]
+
+# straight line from 1 at the seed to 0 at the radius
+DEFAULT_CONTROL_POINTS = [[0.0, 1.0], [1.0, 0.0]]
+
+
+def get_edges(face_vertex_counts, face_vertex_indices):
+    '''
+    unique (n, 2) edges from the face-vertex lists, every face is a closed loop
+    '''
+    face_vertex_counts = np.asarray(face_vertex_counts, dtype=np.int64)
+    face_vertex_indices = np.asarray(face_vertex_indices, dtype=np.int64)
+
+    face_starts = np.cumsum(face_vertex_counts) - face_vertex_counts
+    positions = np.arange(len(face_vertex_indices))
+    face_ids = np.repeat(np.arange(len(face_vertex_counts)), face_vertex_counts)
+
+    # next vertex of the loop, the last one wraps to the first
+    next_positions = positions + 1
+    is_last = next_positions == face_starts[face_ids] + face_vertex_counts[face_ids]
+    next_positions[is_last] = face_starts[face_ids[is_last]]
+
+    edges = np.sort(np.column_stack([face_vertex_indices, face_vertex_indices[next_positions]]), axis=1)
+
+    return np.unique(edges, axis=0)
+
+
+def get_adjacency(vertex_count, edges):
+    '''
+    CSR neighbours: the neighbours of v are neighbours[offsets[v]:offsets[v + 1]]
+    '''
+    edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+    both_ways = np.concatenate([edges, edges[:, ::-1]])
+    both_ways = both_ways[np.argsort(both_ways[:, 0], kind="stable")]
+
+    offsets = np.zeros(vertex_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(both_ways[:, 0], minlength=vertex_count), out=offsets[1:])
+
+    return offsets, both_ways[:, 1].astype(np.int32)
+
+
+def get_volume_distances(points, seeds, radius):
+    '''
+    straight line distance to the closest seed, inf outside of the radius
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    seeds = np.atleast_1d(np.asarray(seeds, dtype=np.int64))
+
+    grid = spatial.SpatialGrid(points, radius)
+    _, point_ids, distances = grid.query_pairs(points[seeds], radius)
+
+    vertex_distances = np.full(len(points), np.inf)
+    np.minimum.at(vertex_distances, point_ids, distances)
+
+    return vertex_distances
+
+
+def get_surface_distances(points, adjacency, seeds, radius):
+    '''
+    distance along the mesh edges to the closest seed, Dijkstra stops at the radius
+    inf for the vertices further than the radius
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    offsets, neighbours = adjacency
+
+    vertex_distances = np.full(len(points), np.inf)
+    queue = []
+
+    for seed in np.atleast_1d(seeds):
+        vertex_distances[seed] = 0.0
+        queue.append((0.0, int(seed)))
+
+    heapq.heapify(queue)
+
+    while queue:
+        distance, vertex = heapq.heappop(queue)
+
+        if distance > vertex_distances[vertex]:
+            continue
+
+        vertex_neighbours = neighbours[offsets[vertex]:offsets[vertex + 1]]
+        new_distances = distance + np.linalg.norm(points[vertex_neighbours] - points[vertex], axis=1)
+
+        closer = (new_distances < vertex_distances[vertex_neighbours]) & (new_distances <= radius)
+        for neighbour, new_distance in zip(vertex_neighbours[closer], new_distances[closer]):
+            vertex_distances[neighbour] = new_distance
+            heapq.heappush(queue, (new_distance, int(neighbour)))
+
+    return vertex_distances
+
+
+def get_weights(distances, radius, control_points=None, sample_count=falloff_curve.SAMPLE_COUNT):
+    '''
+    map the distances through the ssBuddy falloff curve
+    the curve x is the distance divided by the radius, y is the weight
+    returns the vertex ids with a weight and their float32 weights
+    '''
+    if control_points is None:
+        control_points = DEFAULT_CONTROL_POINTS
+
+    curve_points = falloff_curve.sample(control_points, sample_count)
+
+    inside = np.flatnonzero(distances <= radius)
+    weights = np.interp(distances[inside] / radius, curve_points[:, 0], curve_points[:, 1])
+    weights = np.clip(weights, 0.0, 1.0)
+
+    weighted = weights > 0.0
+
+    return inside[weighted].astype(np.int32), weights[weighted].astype(np.float32)
+
+
+def compute_soft_weights(points, seeds, radius, falloff_mode=VOLUME, control_points=None, adjacency=None):
+    '''
+    soft selection weights without Maya's rich selection
+    volume uses a hashed grid, surface walks the mesh edges and needs the adjacency
+    returns the vertex ids and their weights
+    '''
+    if radius <= 0:
+        raise ValueError(f"The falloff radius should be positive, got {radius}")
+
+    if falloff_mode == VOLUME:
+        distances = get_volume_distances(points, seeds, radius)
+    elif falloff_mode == SURFACE:
+        if adjacency is None:
+            raise ValueError("The surface falloff needs the mesh adjacency")
+        distances = get_surface_distances(points, adjacency, seeds, radius)
+    else:
+        raise ValueError(f"Unknown falloff mode '{falloff_mode}', expected one of {FALLOFF_MODES}")
+
+    return get_weights(distances, radius, control_points)
@@ -0,0 +1,69 @@
+import numpy as np
+
+
+DEFAULT_TOLERANCE = 0.00001
+
+
+class SparseDelta(object):
+    '''
+    shape stored as the moved vertex ids and their float32 offsets from the base
+    '''
+
+    def __init__(self, indices, offsets, vertex_count):
+
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.offsets = np.asarray(offsets, dtype=np.float32).reshape(-1, 3)
+        self.vertex_count = int(vertex_count)
+
+        if len(self.indices) != len(self.offsets):
+            raise ValueError(f"{len(self.indices)} vertex ids don't match {len(self.offsets)} offsets")
+
+    @classmethod
+    def from_dense(cls, delta, tolerance=DEFAULT_TOLERANCE):
+        '''
+        keep only the offsets longer than the tolerance
+        '''
+        delta = np.asarray(delta, dtype=np.float64).reshape(-1, 3)
+        indices = np.flatnonzero(np.linalg.norm(delta, axis=1) > tolerance)
+
+        return cls(indices, delta[indices], len(delta))
+
+    @classmethod
+    def from_points(cls, base, shape, tolerance=DEFAULT_TOLERANCE):
+
+        base = np.asarray(base, dtype=np.float64).reshape(-1, 3)
+        shape = np.asarray(shape, dtype=np.float64).reshape(-1, 3)
+
+        if len(base) != len(shape):
+            raise ValueError(f"The shape has {len(shape)} vertices, the base has {len(base)}")
+
+        return cls.from_dense(shape - base, tolerance)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def nbytes(self):
+        return self.indices.nbytes + self.offsets.nbytes
+
+    def to_dense(self):
+        '''
+        (vertex_count, 3) float64 offsets, zero for the vertices that didn't move
+        '''
+        delta = np.zeros((self.vertex_count, 3), dtype=np.float64)
+        delta[self.indices] = self.offsets
+
+        return delta
+
+    def apply(self, base, weight=1.0):
+        '''
+        base points plus the weighted offsets
+        '''
+        points = np.array(base, dtype=np.float64).reshape(-1, 3)
+
+        if len(points) != self.vertex_count:
+            raise ValueError(f"The base has {len(points)} vertices, the delta was made for {self.vertex_count}")
+
+        points[self.indices] += weight * self.offsets
+
+        return points
@@ -0,0 +1,226 @@
+from importlib import reload
+
+import maya.cmds as mc
+from maya import OpenMaya as om
+
+from facial_rig_toolset import head_cut
+from facial_rig_toolset import mesh_io
+from facial_rig_toolset import shape_library
+from facial_rig_toolset import sparse_delta
+reload(head_cut)
+reload(mesh_io)
+reload(sparse_delta)
+reload(shape_library)
+
+
+SPARSE_DELTA_NODE_SUFFIX = "_sparseDelta"
+VERTEX_COUNT_ATTR = "vertexCount"
+INDICES_ATTR = "deltaIndices"
+OFFSETS_ATTR = "deltaOffsets"
+POSITION_ATTR = "shapePosition"
+
+
+def get_sparse_delta_node(shape):
+    return f"{shape}{SPARSE_DELTA_NODE_SUFFIX}"
+
+
+def is_stored(shape):
+    return mc.objExists(get_sparse_delta_node(shape))
+
+
+def write_sparse_delta_node(shape, shape_delta, position=None):
+    '''
+    keep the sparse delta on a network node named after the shape
+    the vertex ids and the offsets are written with one setAttr each
+    '''
+    node = get_sparse_delta_node(shape)
+
+    if not mc.objExists(node):
+        node = mc.createNode("network", name=node)
+        mc.addAttr(node, ln=VERTEX_COUNT_ATTR, at="long")
+        mc.addAttr(node, ln=INDICES_ATTR, dt="Int32Array")
+        mc.addAttr(node, ln=OFFSETS_ATTR, dt="floatArray")
+        mc.addAttr(node, ln=POSITION_ATTR, dt="doubleArray")
+        if position is None:
+            position = [0, 0, 0]
+
+    mc.setAttr(f"{node}.{VERTEX_COUNT_ATTR}", shape_delta.vertex_count)
+    mc.setAttr(f"{node}.{INDICES_ATTR}", shape_delta.indices.tolist(), type="Int32Array")
+    mc.setAttr(f"{node}.{OFFSETS_ATTR}", shape_delta.offsets.ravel().tolist(), type="floatArray")
+
+    if position is not None:
+        mc.setAttr(f"{node}.{POSITION_ATTR}", list(position), type="doubleArray")
+
+    return node
+
+
+def read_sparse_delta_node(shape):
+    '''
+    returns the SparseDelta and the world position of the shape
+    '''
+    node = get_sparse_delta_node(shape)
+
+    shape_delta = sparse_delta.SparseDelta(
+        mc.getAttr(f"{node}.{INDICES_ATTR}") or [],
+        mc.getAttr(f"{node}.{OFFSETS_ATTR}") or [],
+        mc.getAttr(f"{node}.{VERTEX_COUNT_ATTR}")
+    )
+    position = mc.getAttr(f"{node}.{POSITION_ATTR}") or [0, 0, 0]
+
+    return shape_delta, position
+
+
+def store_shape(shape, base_mesh=head_cut.HEAD_GEOMETRY, tolerance=sparse_delta.DEFAULT_TOLERANCE, delete_mesh=True):
+    '''
+    replace the shape mesh with a sparse delta from the base mesh
+    '''
+    for mesh in (shape, base_mesh):
+        if not mc.objExists(mesh):
+            om.MGlobal.displayError(f"The object '{mesh}' doesn't exist.")
+            return
+
+    shape_delta = sparse_delta.SparseDelta.from_points(
+        mesh_io.get_points(base_mesh),
+        mesh_io.get_points(shape),
+        tolerance
+    )
+    position = mc.xform(shape, ws=True, q=True, t=True)
+    node = write_sparse_delta_node(shape, shape_delta, position)
+
+    if delete_mesh:
+        mc.delete(shape)
+
+    return node
+
+
+def materialize_shape(shape, base_mesh=head_cut.HEAD_GEOMETRY):
+    '''
+    rebuild the shape mesh from its sparse delta so it can be sculpted
+    the mesh is returned as it is if it already exists
+    '''
+    if mc.objExists(shape):
+        return shape
+
+    if not is_stored(shape):
+        om.MGlobal.displayError(f"The shape '{shape}' isn't stored as a sparse delta.")
+        return
+
+    if not mc.objExists(base_mesh):
+        om.MGlobal.displayError(f"The object '{base_mesh}' doesn't exist.")
+        return
+
+    shape_delta, position = read_sparse_delta_node(shape)
+
+    new_shape = mc.duplicate(base_mesh, n=shape)[0]
+    mc.delete(new_shape, ch=True)
+
+    for attr in ("translateX", "translateY", "translateZ"):
+        mc.setAttr(f"{new_shape}.{attr}", lock=False)
+
+    if mc.listRelatives(new_shape, parent=True):
+        new_shape = mc.parent(new_shape, world=True)[0]
+
+    mesh_io.edit_points(new_shape, shape_delta.apply(mesh_io.get_points(base_mesh)))
+    mc.xform(new_shape, ws=True, t=position)
+
+    return new_shape
+
+
+def _get_shape_deltas(shapes, base_mesh=head_cut.HEAD_GEOMETRY, tolerance=sparse_delta.DEFAULT_TOLERANCE):
+    '''
+    {shape: SparseDelta} and {shape: world position} of the shapes
+    the stored sparse deltas are used as they are, the meshes are diffed against the base mesh
+    '''
+    base_points = None
+    shape_deltas = {}
+    positions = {}
+
+    for shape in shapes:
+        if is_stored(shape) and not mc.objExists(shape):
+            shape_deltas[shape], positions[shape] = read_sparse_delta_node(shape)
+            continue
+
+        if not mc.objExists(shape):
+            om.MGlobal.displayWarning(f"The shape '{shape}' doesn't exist, skipped.")
+            continue
+
+        if base_points is None:
+            base_points = mesh_io.get_points(base_mesh)
+
+        shape_deltas[shape] = sparse_delta.SparseDelta.from_points(base_points, mesh_io.get_points(shape), tolerance)
+        positions[shape] = mc.xform(shape, ws=True, q=True, t=True)
+
+    return shape_deltas, positions
+
+
+def export_shape_library(path, shapes, kinds=None, base_mesh=head_cut.HEAD_GEOMETRY, tolerance=sparse_delta.DEFAULT_TOLERANCE, compress=False):
+    '''
+    write the shapes with their kind and position into one binary shape library, the side file of the sparse deltas
+    returns the exported shapes
+    '''
+    try:
+        shape_deltas, positions = _get_shape_deltas(shapes, base_mesh, tolerance)
+        shape_library.save_shape_library(path, shape_deltas, kinds, positions, compress)
+    except ValueError as e:
+        om.MGlobal.displayError(str(e))
+        return
+
+    return list(shape_deltas)
+
+
+def import_shape_library(path, shapes=None, base_mesh=head_cut.HEAD_GEOMETRY, materialize=False):
+    '''
+    bring the shapes of the library into the scene as sparse delta nodes
+    materialize rebuilds their meshes as well, only the shapes asked for are read from the file
+    returns the imported shapes
+    '''
+    try:
+        library = shape_library.ShapeLibrary(path)
+    except ValueError as e:
+        om.MGlobal.displayError(str(e))
+        return
+
+    if shapes is None:
+        shapes = library.names
+
+    missing = [shape for shape in shapes if shape not in library]
+    if missing:
+        om.MGlobal.displayWarning(f"The shapes {missing} aren't in the library '{path}', skipped.")
+
+    if library.vertex_count != mesh_io.get_vertex_count(base_mesh):
+        om.MGlobal.displayError(f"The library was made for {library.vertex_count} vertices, '{base_mesh}' has {mesh_io.get_vertex_count(base_mesh)}.")
+        return
+
+    shapes = [shape for shape in shapes if shape in library]
+
+    # checking if the shapes already in the scene
+    existing_shapes = [shape for shape in shapes if mc.objExists(shape) or is_stored(shape)]
+    if existing_shapes:
+        button = mc.confirmDialog(
+            title="The Shape(s) Exist",
+            message=f"It seems, the shapes {existing_shapes} exist. Are you sure you want to replace them? The modification will be lost.",
+            button=["Yes", "No"],
+            defaultButton="No",
+            cancelButton="No",
+            dismissString="No"
+        )
+        if button == "No":
+            return
+
+    imported = []
+    for shape in shapes:
+        if mc.objExists(shape):
+            mc.delete(shape)
+
+        try:
+            write_sparse_delta_node(shape, library.get(shape), library.get_position(shape))
+        except ValueError as e:
+            om.MGlobal.displayError(str(e))
+            return imported
+
+        if materialize:
+            materialize_shape(shape, base_mesh)
+
+        imported.append(shape)
+
+    return imported
@@ -0,0 +1,193 @@
+import numpy as np
+
+
+HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.int64)
+NEIGHBOUR_OFFSETS = np.array(
+    [[x, y, z] for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)],
+    dtype=np.int64
+)
+
+
+def _hash_cells(cells):
+    '''
+    hash integer cell coordinates into one int64 key
+    collisions only add false candidates, the distances are checked afterwards
+    '''
+    return np.bitwise_xor.reduce(cells * HASH_PRIMES, axis=1)
+
+
+def _expand_ranges(starts, counts):
+    '''
+    flatten [start, start + count) ranges into one index array
+    '''
+    total = counts.sum()
+    owners = np.repeat(np.arange(len(starts)), counts)
+    steps = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return owners, np.repeat(starts, counts) + steps
+
+
+class SpatialGrid(object):
+    '''
+    hashed uniform grid over a point cloud
+    the points are bucketed by cell, a lookup only visits the 27 neighbouring cells
+    '''
+
+    def __init__(self, points, cell_size):
+
+        if cell_size <= 0:
+            raise ValueError(f"The cell size should be positive, got {cell_size}")
+
+        self.points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+
+        keys = _hash_cells(self._cells(self.points))
+        self._order = np.argsort(keys, kind="stable")
+        self._sorted_keys = keys[self._order]
+
+    def __len__(self):
+        return len(self.points)
+
+    def _cells(self, points):
+        return np.floor(points / self.cell_size).astype(np.int64)
+
+    def query_pairs(self, queries, radius=None):
+        '''
+        find every (query, point) pair closer than the radius
+        the radius can't be bigger than the cell size
+        returns query indices, point indices and distances
+        '''
+        if radius is None:
+            radius = self.cell_size
+
+        if radius > self.cell_size:
+            raise ValueError(f"The radius {radius} is bigger than the cell size {self.cell_size}")
+
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+        query_cells = self._cells(queries)
+
+        query_ids = []
+        point_ids = []
+
+        for offset in NEIGHBOUR_OFFSETS:
+            keys = _hash_cells(query_cells + offset)
+            left = np.searchsorted(self._sorted_keys, keys, side="left")
+            right = np.searchsorted(self._sorted_keys, keys, side="right")
+
+            owners, slots = _expand_ranges(left, right - left)
+            query_ids.append(owners)
+            point_ids.append(self._order[slots])
+
+        query_ids = np.concatenate(query_ids)
+        point_ids = np.concatenate(point_ids)
+
+        # hash collisions can bring the same point in from two cells
+        _, unique = np.unique(query_ids * len(self.points) + point_ids, return_index=True)
+        query_ids = query_ids[unique]
+        point_ids = point_ids[unique]
+
+        distances = np.linalg.norm(queries[query_ids] - self.points[point_ids], axis=1)
+        inside = distances <= radius
+
+        return query_ids[inside], point_ids[inside], distances[inside]
+
+    def nearest(self, queries, radius=None):
+        '''
+        closest point for every query within the radius
+        returns point indices (-1 if nothing is found) and distances (inf if nothing is found)
+        '''
+        queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+
+        nearest_ids = np.full(len(queries), -1, dtype=np.int64)
+        nearest_distances = np.full(len(queries), np.inf)
+
+        query_ids, point_ids, distances = self.query_pairs(queries, radius)
+
+        if len(query_ids):
+            order = np.lexsort((distances, query_ids))
+            query_ids = query_ids[order]
+            first = np.r_[True, query_ids[1:] != query_ids[:-1]]
+
+            nearest_ids[query_ids[first]] = point_ids[order][first]
+            nearest_distances[query_ids[first]] = distances[order][first]
+
+        return nearest_ids, nearest_distances
+
+
+def assign_pairs(rows, cols, distances):
+    '''
+    greedy one-to-one assignment of candidate pairs, the closest pairs win
+    every round accepts the pairs that are the best choice for both of their ends
+    returns the accepted rows and cols
+    '''
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    distances = np.asarray(distances, dtype=np.float64)
+
+    accepted_rows = []
+    accepted_cols = []
+
+    while len(rows):
+        order = np.lexsort((cols, rows, distances))
+        rows = rows[order]
+        cols = cols[order]
+        distances = distances[order]
+
+        # np.unique returns the first occurrence, which is the closest one after sorting
+        _, best_for_row = np.unique(rows, return_index=True)
+        _, best_for_col = np.unique(cols, return_index=True)
+        mutual = np.intersect1d(best_for_row, best_for_col, assume_unique=True)
+
+        accepted_rows.append(rows[mutual])
+        accepted_cols.append(cols[mutual])
+
+        keep = ~np.isin(rows, rows[mutual]) & ~np.isin(cols, cols[mutual])
+        rows = rows[keep]
+        cols = cols[keep]
+        distances = distances[keep]
+
+    if not accepted_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    return np.concatenate(accepted_rows), np.concatenate(accepted_cols)
+
+
+def find_nearest(points, queries, cell_size=None, max_distance=None, growth=2.0):
+    '''
+    closest point for every query at any distance
+    the queries not found in a grid are searched again in a grid growth times coarser
+    cell_size defaults to the average spacing of the points on a surface
+    returns point indices (-1 past max_distance) and distances (inf past max_distance)
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+    queries = np.asarray(queries, dtype=np.float64).reshape(-1, 3)
+
+    nearest_ids = np.full(len(queries), -1, dtype=np.int64)
+    nearest_distances = np.full(len(queries), np.inf)
+
+    if not len(points) or not len(queries):
+        return nearest_ids, nearest_distances
+
+    extent = max(float(np.linalg.norm(np.ptp(np.concatenate([points, queries]), axis=0))), 1e-6)
+    if cell_size is None:
+        cell_size = extent / np.sqrt(len(points))
+    cell_size = max(cell_size, 1e-9)
+
+    remaining = np.arange(len(queries))
+
+    while len(remaining):
+        radius = cell_size if max_distance is None else min(cell_size, max_distance)
+
+        ids, distances = SpatialGrid(points, cell_size).nearest(queries[remaining], radius)
+        found = ids >= 0
+        nearest_ids[remaining[found]] = ids[found]
+        nearest_distances[remaining[found]] = distances[found]
+        remaining = remaining[~found]
+
+        # everything is within the grid once a cell covers the whole extent
+        if radius >= extent or (max_distance is not None and radius >= max_distance):
+            break
+
+        cell_size *= growth
+
+    return nearest_ids, nearest_distances
@@ -0,0 +1,41 @@
+from importlib import reload
+
+import maya.cmds as mc
+
+from facial_rig_toolset import falloff_curve
+reload(falloff_curve)
+
+
+def read_curve_points(curve_widget):
+    '''
+    control points of the falloffCurve widget
+    '''
+    return falloff_curve.parse_curve_string(mc.falloffCurve(curve_widget, q=True, asString=True))
+
+
+def apply_falloff_curve(control_points, sample_count=falloff_curve.SAMPLE_COUNT):
+    '''
+    sample the curve and set it as the soft selection falloff curve
+    '''
+    mc.softSelect(ssc=falloff_curve.get_ssc_string(falloff_curve.sample(control_points, sample_count)))
+
+
+def apply_curve_widget(curve_widget, sample_count=falloff_curve.SAMPLE_COUNT):
+    '''
+    called by ssBuddy every time the curve changes
+    '''
+    apply_falloff_curve(read_curve_points(curve_widget), sample_count)
+
+
+def test_timing(curve_widget, runs=falloff_curve.TIMING_RUNS):
+    '''
+    SSB.testTiming, evaluate the widget curve 'runs' times with and without the cache
+    '''
+    control_points = read_curve_points(curve_widget)
+
+    uncached_time = falloff_curve.time_evaluation(control_points, runs, use_cache=False)
+    cached_time = falloff_curve.time_evaluation(control_points, runs, use_cache=True)
+
+    print(f"{runs} falloff curve evaluations: {uncached_time:.4f}s, cached {cached_time:.4f}s")
+
+    return uncached_time, cached_time
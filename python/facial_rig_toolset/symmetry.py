@@ -0,0 +1,353 @@
+import hashlib
+import os
+
+import numpy as np
+
+from facial_rig_toolset import spatial
+
+
+DEFAULT_TOLERANCE = 0.001
+# same as $midOffsetTol in abCheckSym, verts that close to the middle count as positive
+MID_OFFSET_TOLERANCE = -0.00001
+
+SIDE_NEGATIVE = -1
+SIDE_MIDDLE = 0
+SIDE_POSITIVE = 1
+
+CACHE_EXTENSION = ".npy"
+CACHE_SPACE = "object"
+
+
+def get_mid(points, axis=0):
+    '''
+    bounding box centre of the points on the mirror axis
+    axis: 0 - x, 1 - y, 2 - z
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    return (points[:, axis].min() + points[:, axis].max()) / 2.0
+
+
+def mirror_points(points, axis=0, mid=0.0):
+    '''
+    reflect the points across the plane going through mid on the axis
+    '''
+    mirrored = np.array(points, dtype=np.float64).reshape(-1, 3)
+    mirrored[:, axis] = 2.0 * mid - mirrored[:, axis]
+
+    return mirrored
+
+
+def get_sides(points, axis=0, tolerance=DEFAULT_TOLERANCE, mid=None):
+    '''
+    sort the vertices the same way abCheckSym does
+    1 - positive side, -1 - negative side, 0 - on the mirror plane
+    mid is the bounding box centre if it isn't given
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    if mid is None:
+        mid = get_mid(points, axis)
+
+    offset = points[:, axis] - mid
+
+    sides = np.where(offset >= MID_OFFSET_TOLERANCE, SIDE_POSITIVE, SIDE_NEGATIVE).astype(np.int8)
+    sides[np.abs(offset) < tolerance] = SIDE_MIDDLE
+
+    return sides
+
+
+def build_symmetry_table(points, axis=0, tolerance=DEFAULT_TOLERANCE, mid=None):
+    '''
+    array version of abCheckSym
+    the negative side is reflected and matched to the positive side with a hashed grid
+    returns:
+        table - (n, 2) int32 array of [positive vertex, negative vertex] pairs,
+                table.ravel() is laid out like $abSymTable
+        non_symmetric - int32 array of the vertices without a pair,
+                        the positive ones first, like abCheckSym returns them
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    if mid is None:
+        mid = get_mid(points, axis)
+
+    sides = get_sides(points, axis, tolerance, mid)
+    positive = np.flatnonzero(sides == SIDE_POSITIVE)
+    negative = np.flatnonzero(sides == SIDE_NEGATIVE)
+
+    grid = spatial.SpatialGrid(mirror_points(points[negative], axis, mid), tolerance)
+    rows, cols, distances = grid.query_pairs(points[positive], tolerance)
+    rows, cols = spatial.assign_pairs(rows, cols, distances)
+
+    order = np.argsort(positive[rows])
+    table = np.column_stack([positive[rows][order], negative[cols][order]]).astype(np.int32)
+
+    non_symmetric = np.concatenate([
+        np.setdiff1d(positive, table[:, 0]),
+        np.setdiff1d(negative, table[:, 1])
+    ]).astype(np.int32)
+
+    return table, non_symmetric
+
+
+class SymmetryMap(object):
+    '''
+    dense mirror lookup for one topology
+    mirror[i] is the vertex across the mirror plane, -1 if the vertex has no pair
+    sides[i] is 1, -1 or 0 (on the mirror plane) for the base mesh
+    mid is the mirror plane position on the axis, in the space of the points the map was built from
+    '''
+
+    def __init__(self, mirror, sides, axis=0, mid=0.0):
+
+        self.mirror = np.asarray(mirror, dtype=np.int32)
+        self.sides = np.asarray(sides, dtype=np.int8)
+        self.axis = axis
+        self.mid = float(mid)
+
+        if self.mirror.shape != self.sides.shape:
+            raise ValueError(f"The mirror table has {len(self.mirror)} vertices, the sides have {len(self.sides)}")
+
+    @classmethod
+    def from_table(cls, table, sides, axis=0, mid=0.0):
+        '''
+        build the map from a [positive, negative] pair table
+        '''
+        table = np.asarray(table, dtype=np.int32).reshape(-1, 2)
+
+        mirror = np.full(len(sides), -1, dtype=np.int32)
+        mirror[table[:, 0]] = table[:, 1]
+        mirror[table[:, 1]] = table[:, 0]
+
+        return cls(mirror, sides, axis, mid)
+
+    @classmethod
+    def from_points(cls, points, axis=0, tolerance=DEFAULT_TOLERANCE, mid=None):
+        '''
+        build the map from the base mesh points
+        '''
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+        if mid is None:
+            mid = get_mid(points, axis)
+
+        table, _ = build_symmetry_table(points, axis, tolerance, mid)
+
+        return cls.from_table(table, get_sides(points, axis, tolerance, mid), axis, mid)
+
+    def __len__(self):
+        return len(self.mirror)
+
+    @property
+    def table(self):
+        '''
+        [positive, negative] pairs, the same layout as $abSymTable
+        '''
+        positive = np.flatnonzero((self.sides == SIDE_POSITIVE) & (self.mirror >= 0))
+
+        return np.column_stack([positive, self.mirror[positive]]).astype(np.int32)
+
+    @property
+    def middle(self):
+        return np.flatnonzero(self.sides == SIDE_MIDDLE)
+
+    @property
+    def unmatched(self):
+        return np.flatnonzero((self.mirror < 0) & (self.sides != SIDE_MIDDLE))
+
+    def get_mirror_vertex(self, index):
+        '''
+        abGetSymVtx, returns -1 if the vertex has no pair
+        '''
+        return int(self.mirror[index])
+
+    def get_mirror_indices(self, indices):
+        '''
+        abSelMirror, the vertices without a pair are returned as they are
+        '''
+        indices = np.asarray(indices, dtype=np.int64)
+        mirrored = self.mirror[indices]
+
+        return np.where(mirrored >= 0, mirrored, indices)
+
+    def get_side_indices(self, side, indices=None):
+        '''
+        vertices on one side of the base mesh, optionally limited to the given ones
+        '''
+        if indices is None:
+            return np.flatnonzero(self.sides == side)
+
+        indices = np.asarray(indices, dtype=np.int64)
+
+        return indices[self.sides[indices] == side]
+
+
+def mirror_shape_points(points, symmetry_map, axis=None, mid=0.0, flip=False, negative_to_positive=False, indices=None):
+    '''
+    abMirrorSel on a whole point array
+    mirror - the positive side is reflected onto the negative side, the middle is flattened onto the plane
+    flip - the sides are swapped and the middle is reflected
+    indices limit the operation to the given vertices, like a component selection
+    '''
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    if len(points) != len(symmetry_map):
+        raise ValueError(f"The shape has {len(points)} vertices, the symmetry map has {len(symmetry_map)}")
+
+    if axis is None:
+        axis = symmetry_map.axis
+
+    if indices is None:
+        indices = np.arange(len(points))
+
+    source_side = SIDE_NEGATIVE if negative_to_positive else SIDE_POSITIVE
+
+    sources = symmetry_map.get_side_indices(source_side, indices)
+    sources = sources[symmetry_map.mirror[sources] >= 0]
+    targets = symmetry_map.mirror[sources]
+    middle = symmetry_map.get_side_indices(SIDE_MIDDLE, indices)
+
+    result = points.copy()
+    result[targets] = mirror_points(points[sources], axis, mid)
+
+    if flip:
+        result[sources] = mirror_points(points[targets], axis, mid)
+        result[middle] = mirror_points(points[middle], axis, mid)
+    else:
+        result[middle, axis] = mid
+
+    return result
+
+
+def get_topology_hash(vertex_count, face_vertex_counts, face_vertex_indices):
+    '''
+    hash of the mesh topology: vertex count, vertices per face and face-vertex connectivity
+    the point positions don't change the hash
+    '''
+    topology_hash = hashlib.sha1()
+    topology_hash.update(np.int64(vertex_count).tobytes())
+    topology_hash.update(np.ascontiguousarray(face_vertex_counts, dtype=np.int32).tobytes())
+    topology_hash.update(np.ascontiguousarray(face_vertex_indices, dtype=np.int32).tobytes())
+
+    return topology_hash.hexdigest()
+
+
+def get_cache_key(topology_hash, axis=0, tolerance=DEFAULT_TOLERANCE):
+    '''
+    the map also depends on the axis and the tolerance it was built with,
+    the space tells the object space maps from the world space ones written before
+    '''
+    return hashlib.sha1(f"{topology_hash}_{axis}_{tolerance!r}_{CACHE_SPACE}".encode()).hexdigest()[:16]
+
+
+def save_symmetry_map(path, symmetry_map):
+    '''
+    write the map as one (2, n) int32 .npy file, the first row is mirror, the second is sides
+    '''
+    directory = os.path.dirname(path)
+
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    np.save(path, np.vstack([symmetry_map.mirror, symmetry_map.sides]).astype(np.int32))
+
+
+def load_symmetry_map(path, axis=0, mid=0.0):
+    '''
+    memory map a map written by save_symmetry_map, the mid isn't saved with it
+    returns None if the file doesn't exist or can't be read
+    '''
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        data = np.load(path, mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+
+    if data.ndim != 2 or data.shape[0] != 2:
+        return None
+
+    return SymmetryMap(data[0], data[1], axis, mid)
+
+
+def symmetrize_points(points, indices=None, start_tolerance=0.000001, end_tolerance=1.0, iterations=200, axis=0, progress=None):
+    '''
+    abSymmetrizeVerts on a point array, the mirror plane is the origin of the axis
+    the positive verts are matched one to one to the negative verts in a growing radius,
+    tolerance = end * t^2 + start like in the MEL version
+    the matched negative verts are moved onto the reflected positive ones
+    progress is called with (iteration, matched count) after every radius
+    returns the new points, the matched positive and the matched negative vertex ids
+    '''
+    if start_tolerance > end_tolerance:
+        raise ValueError("Start radius must be less than end radius")
+
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+
+    if indices is None:
+        indices = np.arange(len(points))
+
+    indices = np.asarray(indices, dtype=np.int64)
+    offset = points[indices, axis]
+    positive = indices[offset > start_tolerance]
+    negative = indices[offset < -start_tolerance]
+
+    mirrored = mirror_points(points[positive], axis)
+    remaining_rows = np.arange(len(positive))
+    remaining_cols = np.arange(len(negative))
+
+    max_tolerance = end_tolerance + start_tolerance
+    radius = 0.0
+    rows = cols = np.empty(0, dtype=np.int64)
+    distances = np.empty(0)
+
+    matched_rows = []
+    matched_cols = []
+    matched_count = 0
+
+    for iteration in range(iterations):
+        if not len(remaining_rows) or not len(remaining_cols):
+            break
+
+        t = float(iteration) / float(max(iterations - 1, 1))
+        tolerance = end_tolerance * t * t + start_tolerance
+
+        # the unmatched verts are paired again within twice the tolerance once it outgrows the last radius,
+        # so the pairs follow what is left to match rather than the end radius
+        if tolerance > radius:
+            radius = min(2.0 * tolerance, max_tolerance)
+            grid = spatial.SpatialGrid(points[negative[remaining_cols]], radius)
+            rows, cols, distances = grid.query_pairs(mirrored[remaining_rows], radius)
+            rows = remaining_rows[rows]
+            cols = remaining_cols[cols]
+
+        inside = distances < tolerance
+        if inside.any():
+            new_rows, new_cols = spatial.assign_pairs(rows[inside], cols[inside], distances[inside])
+            matched_rows.append(new_rows)
+            matched_cols.append(new_cols)
+            matched_count += len(new_rows)
+
+            keep = ~np.isin(rows, new_rows) & ~np.isin(cols, new_cols)
+            rows = rows[keep]
+            cols = cols[keep]
+            distances = distances[keep]
+            remaining_rows = np.setdiff1d(remaining_rows, new_rows, assume_unique=True)
+            remaining_cols = np.setdiff1d(remaining_cols, new_cols, assume_unique=True)
+
+        if progress is not None:
+            progress(iteration, matched_count)
+
+    if matched_rows:
+        matched_positive = positive[np.concatenate(matched_rows)]
+        matched_negative = negative[np.concatenate(matched_cols)]
+    else:
+        matched_positive = np.empty(0, dtype=np.int64)
+        matched_negative = np.empty(0, dtype=np.int64)
+
+    result = points.copy()
+    result[matched_negative] = mirror_points(points[matched_positive], axis)
+
+    return result, matched_positive, matched_negative
@@ -0,0 +1,395 @@
+from importlib import reload
+import glob
+import os
+
+import numpy as np
+
+import maya.cmds as mc
+from maya import OpenMaya as om
+
+from facial_rig_toolset import delta_math
+from facial_rig_toolset import head_cut
+from facial_rig_toolset import mesh_cache
+from facial_rig_toolset import mesh_io
+from facial_rig_toolset import symmetry
+reload(delta_math)
+reload(head_cut)
+reload(mesh_io)
+reload(mesh_cache)
+reload(symmetry)
+
+
+SYMMETRY_CACHE_FOLDER = "symmetry_cache"
+CACHE_HASH_LENGTH = 16
+
+
+def _get_mid(mesh, axis, use_pivot, world_space=True):
+    '''
+    mirror plane position, the pivot or the bounding box centre like in abCheckSym
+    None stands for the bounding box centre
+    '''
+    if use_pivot:
+        if world_space:
+            return mc.xform(mesh, q=True, ws=True, t=True)[axis]
+        return mc.xform(mesh, q=True, os=True, rp=True)[axis]
+
+    return None
+
+
+def build_symmetry_table(mesh, axis=0, tolerance=symmetry.DEFAULT_TOLERANCE, use_pivot=False):
+    '''
+    python version of abCheckSym with $bTable on
+    reads the points once and returns the pair table and the non symmetric vertex ids
+    '''
+    points = mesh_io.get_points(mesh, world_space=True)
+
+    return symmetry.build_symmetry_table(points, axis, tolerance, _get_mid(mesh, axis, use_pivot))
+
+
+def _get_cache_path(mesh, axis, tolerance):
+    '''
+    the cache lives in the 'symmetry_cache' folder next to the scene
+    the file name is '<mesh>_<topology hash>_<settings key>', so a topology change makes a new file
+    returns None if the scene isn't saved
+    '''
+    scene_path = mc.file(q=True, sceneName=True)
+
+    if not scene_path:
+        return None
+
+    topology_hash = symmetry.get_topology_hash(*mesh_cache.get_topology(mesh))
+    cache_key = symmetry.get_cache_key(topology_hash, axis, tolerance)
+    mesh_name = mesh.replace('|', '_').replace(':', '_').strip('_')
+
+    return os.path.join(
+        os.path.dirname(scene_path),
+        SYMMETRY_CACHE_FOLDER,
+        f"{mesh_name}_{topology_hash[:CACHE_HASH_LENGTH]}_{cache_key}{symmetry.CACHE_EXTENSION}"
+    )
+
+
+def _split_cache_path(cache_path):
+    '''
+    (mesh name, topology hash) of a cache file
+    '''
+    name = os.path.basename(cache_path)[:-len(symmetry.CACHE_EXTENSION)]
+    parts = name.rsplit('_', 2)
+
+    if len(parts) != 3:
+        return None, None
+
+    return parts[0], parts[1]
+
+
+def _remove_stale_caches(cache_path):
+    '''
+    delete the caches of the same mesh built for another topology,
+    the ones for the same topology with another axis or tolerance stay
+    '''
+    mesh_name, topology_hash = _split_cache_path(cache_path)
+    directory = os.path.dirname(cache_path)
+
+    for stale_path in glob.glob(os.path.join(directory, f"{glob.escape(mesh_name)}_*{symmetry.CACHE_EXTENSION}")):
+        stale_mesh_name, stale_topology_hash = _split_cache_path(stale_path)
+        if stale_mesh_name != mesh_name or stale_topology_hash == topology_hash:
+            continue
+        try:
+            os.remove(stale_path)
+        except OSError:
+            om.MGlobal.displayWarning(f"Couldn't delete the stale symmetry cache {stale_path}")
+
+
+def get_symmetry_map(base_mesh=head_cut.HEAD_GEOMETRY, axis=0, tolerance=symmetry.DEFAULT_TOLERANCE, use_pivot=False, use_cache=True):
+    '''
+    symmetry map of the base mesh, the python counterpart of 'Select Base Geometry'
+    the map is reused from the cache while the topology stays the same
+    the pivot mode isn't cached as it depends on the pivot position
+    the map is built in object space, the space the shapes are mirrored in
+    '''
+    if not mc.objExists(base_mesh):
+        om.MGlobal.displayError(f"The object '{base_mesh}' doesn't exist.")
+        return
+
+    points = mesh_io.get_points(base_mesh)
+    mid = _get_mid(base_mesh, axis, use_pivot, world_space=False)
+    if mid is None:
+        mid = symmetry.get_mid(points, axis)
+
+    cache_path = None
+    if use_cache and not use_pivot:
+        cache_path = _get_cache_path(base_mesh, axis, tolerance)
+
+    if cache_path:
+        symmetry_map = symmetry.load_symmetry_map(cache_path, axis, mid)
+        if symmetry_map is not None and len(symmetry_map) == len(points):
+            return symmetry_map
+
+    symmetry_map = symmetry.SymmetryMap.from_points(points, axis, tolerance, mid)
+
+    if len(symmetry_map.unmatched):
+        om.MGlobal.displayWarning("Base geometry is not symmetrical, not all vertices can be mirrored")
+
+    if cache_path:
+        symmetry.save_symmetry_map(cache_path, symmetry_map)
+        _remove_stale_caches(cache_path)
+
+    return symmetry_map
+
+
+def select_mirror(symmetry_map=None, base_mesh=head_cut.HEAD_GEOMETRY):
+    '''
+    abSelMirror, select the mirrored vertices of the selected ones
+    the vertices without a pair stay selected
+    '''
+    selected_verts = mc.filterExpand(sm=31)
+
+    if not selected_verts:
+        om.MGlobal.displayError("Please select the vertices to mirror the selection")
+        return
+
+    if symmetry_map is None:
+        symmetry_map = get_symmetry_map(base_mesh)
+        if symmetry_map is None:
+            return
+
+    mesh = selected_verts[0].split('.')[0]
+    indices = mesh_io.get_vertex_indices([vert for vert in selected_verts if vert.split('.')[0] == mesh])
+
+    mirrored_verts = mesh_io.vertex_components(mesh, symmetry_map.get_mirror_indices(indices))
+    mc.select(mirrored_verts, r=True)
+
+    return mirrored_verts
+
+
+def mirror_shape(source, target, symmetry_map, axis=None, flip=False, negative_to_positive=False):
+    '''
+    mirror or flip the source shape into the target shape
+    the points are read once and written back in one undoable call, in object space
+    around the mirror plane of the map, which get_symmetry_map builds in object space too
+    '''
+    for mesh in (source, target):
+        if not mc.objExists(mesh):
+            om.MGlobal.displayError(f"The object '{mesh}' doesn't exist.")
+            return
+
+        vertex_count = mesh_io.get_vertex_count(mesh)
+        if vertex_count != len(symmetry_map):
+            om.MGlobal.displayError(f"'{mesh}' has {vertex_count} vertices, the symmetry map has {len(symmetry_map)}. Unable to proceed.")
+            return
+
+    points = mesh_io.get_points(source)
+    mirrored_points = symmetry.mirror_shape_points(
+        points,
+        symmetry_map,
+        axis=axis,
+        mid=symmetry_map.mid,
+        flip=flip,
+        negative_to_positive=negative_to_positive
+    )
+    mesh_io.edit_points(target, mirrored_points)
+
+
+def add_subtract_copy_mesh(base_mesh, source, target, operation, symmetry_map=None, offset_from_target=False):
+    '''
+    abSMAddSubtractCopyMesh, target ± (source - base) in object space
+    operation: delta_math.SUBTRACT, delta_math.ADD or delta_math.COPY
+    symmetry_map mirrors the offset, offset_from_target measures it from the target
+    every mesh is read once and the target is written in one undoable call
+    '''
+    meshes = [source, target] if offset_from_target else [base_mesh, source, target]
+
+    for mesh in meshes:
+        if not mc.objExists(mesh):
+            om.MGlobal.displayError(f"The object '{mesh}' doesn't exist.")
+            return
+
+    vertex_counts = set(mesh_io.get_vertex_count(mesh) for mesh in meshes)
+
+    if len(vertex_counts) > 1:
+        om.MGlobal.displayError(f"The topology of {meshes} doesn't match. Unable to proceed.")
+        return
+
+    target_points = mesh_io.get_points(target)
+    base_points = target_points if offset_from_target else mesh_io.get_points(base_mesh)
+
+    new_points = delta_math.apply_delta(
+        base_points,
+        mesh_io.get_points(source),
+        target_points,
+        operation,
+        symmetry_map=symmetry_map,
+        offset_from_target=offset_from_target
+    )
+    mesh_io.edit_points(target, new_points)
+
+
+def add_subtract_copy_selected(operation, base_mesh=head_cut.HEAD_GEOMETRY, mirror=False, offset_from_target=False):
+    '''
+    abSMServiceAddSubtractCopy, select the source then the target
+    '''
+    meshes_selected = mc.ls(selection=True, type='transform')
+
+    if not meshes_selected or len(meshes_selected) != 2:
+        om.MGlobal.displayError("Please select two mesh objects (source and target)")
+        return
+
+    if base_mesh in meshes_selected:
+        om.MGlobal.displayError("The base mesh cannot be used as a source or target")
+        return
+
+    symmetry_map = None
+    if mirror:
+        symmetry_map = get_symmetry_map(base_mesh)
+        if symmetry_map is None:
+            return
+
+    add_subtract_copy_mesh(
+        base_mesh,
+        meshes_selected[0],
+        meshes_selected[1],
+        operation,
+        symmetry_map=symmetry_map,
+        offset_from_target=offset_from_target
+    )
+
+
+def symmetrize_verts(start_tolerance=0.000001, end_tolerance=1.0, iterations=200):
+    '''
+    abSymmetrizeVerts, select asymmetrical verts on a single object
+    the negative side verts are snapped onto the reflected positive side verts in object space
+    the verts left without a pair stay selected
+    '''
+    selected_verts = mc.filterExpand(sm=31)
+    hilited_objects = mc.ls(hilite=True)
+
+    if not selected_verts or not hilited_objects or len(hilited_objects) != 1:
+        om.MGlobal.displayError("Select asymmetrical verts on a single object and try again.")
+        return
+
+    if start_tolerance > end_tolerance:
+        om.MGlobal.displayError("Start radius must be less than end radius. Try again.")
+        return
+
+    mesh = hilited_objects[0]
+    indices = mesh_io.get_vertex_indices(selected_verts)
+    points = mesh_io.get_points(mesh)
+
+    def _update_progress(iteration, matched_count):
+        plural = "vertex" if matched_count == 1 else "vertices"
+        mc.progressWindow(
+            e=True,
+            progress=int(100.0 * (iteration + 1) / iterations),
+            status=f"Matched {matched_count} {plural}"
+        )
+
+    mc.waitCursor(state=True)
+    mc.progressWindow(title="Working", progress=0, status="Matched 0 vertices")
+
+    try:
+        new_points, matched_positive, matched_negative = symmetry.symmetrize_points(
+            points,
+            indices,
+            start_tolerance,
+            end_tolerance,
+            iterations,
+            progress=_update_progress
+        )
+        mesh_io.edit_points(mesh, new_points)
+    finally:
+        mc.progressWindow(endProgress=True)
+        mc.waitCursor(state=False)
+
+    matched = np.union1d(matched_positive, matched_negative)
+    unmatched_verts = mesh_io.vertex_components(mesh, np.setdiff1d(indices, matched))
+
+    if unmatched_verts:
+        mc.select(unmatched_verts, r=True)
+    else:
+        mc.select(clear=True)
+
+    plural = "vertex" if len(matched_negative) == 1 else "vertices"
+    om.MGlobal.displayInfo(f"Symmetrized {len(matched_negative)} {plural}.")
+
+    return len(matched_negative)
+
+
+def get_moved_verts(mesh, base_mesh=head_cut.HEAD_GEOMETRY, tolerance=0.001, with_magnitudes=False):
+    '''
+    abSelMovedVerts, compare the mesh to the base mesh in object space
+    returns the moved vertex components, and their offset lengths if with_magnitudes is on
+    '''
+    for obj in (mesh, base_mesh):
+        if not mc.objExists(obj):
+            om.MGlobal.displayError(f"The object '{obj}' doesn't exist.")
+            return
+
+    if mesh_io.get_vertex_count(mesh) != mesh_io.get_vertex_count(base_mesh):
+        om.MGlobal.displayError(f"'{mesh}' topology doesn't match '{base_mesh}'. Unable to proceed.")
+        return
+
+    moved, magnitudes = delta_math.get_moved_vertices(
+        mesh_io.get_points(base_mesh),
+        mesh_io.get_points(mesh),
+        tolerance
+    )
+    if with_magnitudes:
+        return [f"{mesh}.vtx[{index}]" for index in moved], magnitudes
+
+    return mesh_io.vertex_components(mesh, moved)
+
+
+def select_moved_verts(base_mesh=head_cut.HEAD_GEOMETRY, tolerance=0.001):
+    '''
+    select the vertices of the selected model moved relative to the base mesh
+    '''
+    models_selected = mc.ls(selection=True, type='transform')
+
+    if not models_selected:
+        om.MGlobal.displayError("Please select the model")
+        return
+
+    moved_verts = []
+    for model in models_selected:
+        model_moved_verts = get_moved_verts(model, base_mesh, tolerance)
+        if model_moved_verts:
+            moved_verts.extend(model_moved_verts)
+
+    if moved_verts:
+        mc.select(moved_verts, r=True)
+    else:
+        om.MGlobal.displayInfo(f"No vertices have been moved relative to '{base_mesh}'")
+
+    return moved_verts
+
+
+def check_symmetry(axis=0, tolerance=symmetry.DEFAULT_TOLERANCE, use_pivot=False):
+    '''
+    select the asymmetric vertices of the selected model
+    the model should be at the origin unless use_pivot is on
+    '''
+    models_selected = mc.ls(selection=True, type='transform')
+
+    if not models_selected:
+        om.MGlobal.displayError("Please select the model")
+        return
+
+    mesh = models_selected[0]
+    points = mesh_io.get_points(mesh, world_space=True)
+    mid = _get_mid(mesh, axis, use_pivot)
+
+    # if the object isn't symmetrical it has to be at the origin to measure symmetry
+    if mid is None:
+        mid = 0.0
+
+    _, non_symmetric = symmetry.build_symmetry_table(points, axis, tolerance, mid)
+
+    if not len(non_symmetric):
+        om.MGlobal.displayInfo(f"'{mesh}' is symmetrical")
+        mc.select(mesh)
+        return []
+
+    non_symmetric_verts = mesh_io.vertex_components(mesh, non_symmetric)
+    mc.select(non_symmetric_verts)
+    om.MGlobal.displayWarning(f"'{mesh}' has {len(non_symmetric)} asymmetric vertices")
+
+    return non_symmetric_verts
@@ -0,0 +1,6 @@
+import os
+import sys
+
+
+# the array modules are imported from the package folder, without Maya
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,91 @@
+import numpy as np
+
+from facial_rig_toolset import closest_point
+
+
+def _closest_on_segments(points, a, b):
+    ab = b - a
+    t = np.einsum('ij,ij->i', points - a, ab) / np.maximum(np.einsum('ij,ij->i', ab, ab), 1e-300)
+    t = np.clip(t, 0.0, 1.0)
+
+    return a + t[:, None] * ab
+
+
+def _reference_closest(points, a, b, c):
+    '''
+    the plane projection when it falls inside the triangle, otherwise the closest of the three edges
+    '''
+    normal = np.cross(b - a, c - a)
+    normal /= np.linalg.norm(normal, axis=1)[:, None]
+    projected = points - np.einsum('ij,ij->i', points - a, normal)[:, None] * normal
+
+    inside = np.ones(len(points), dtype=bool)
+    for start, end in ((a, b), (b, c), (c, a)):
+        inside &= np.einsum('ij,ij->i', np.cross(end - start, projected - start), normal) >= 0
+
+    candidates = [projected] + [_closest_on_segments(points, start, end) for start, end in ((a, b), (b, c), (c, a))]
+    distances = np.column_stack([np.linalg.norm(candidate - points, axis=1) for candidate in candidates])
+    distances[~inside, 0] = np.inf
+
+    return np.stack(candidates, axis=1)[np.arange(len(points)), distances.argmin(axis=1)]
+
+
+def _grid_mesh(size=20):
+    '''
+    a wavy size x size quad grid
+    '''
+    x, z = np.meshgrid(np.linspace(0.0, 1.0, size + 1), np.linspace(0.0, 1.0, size + 1))
+    y = 0.1 * np.sin(6.0 * x) * np.cos(4.0 * z)
+    points = np.column_stack([x.ravel(), y.ravel(), z.ravel()])
+
+    rows, columns = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    corners = rows.ravel() * (size + 1) + columns.ravel()
+    face_vertex_indices = np.column_stack([corners, corners + 1, corners + size + 2, corners + size + 1]).ravel()
+
+    return points, np.full(size * size, 4), face_vertex_indices
+
+
+def test_closest_points_on_triangles_matches_reference():
+    rng = np.random.default_rng(0)
+    a, b, c = (rng.normal(size=(2000, 3)) for _ in range(3))
+    points = rng.normal(scale=2.0, size=(2000, 3))
+
+    closest, barycentric = closest_point.closest_points_on_triangles(points, a, b, c)
+
+    assert np.allclose(barycentric.sum(axis=1), 1.0)
+    assert (barycentric >= -1e-9).all()
+    assert np.allclose(barycentric[:, :1] * a + barycentric[:, 1:2] * b + barycentric[:, 2:] * c, closest)
+    assert np.allclose(closest, _reference_closest(points, a, b, c), atol=1e-9)
+
+
+def test_triangulate_fans_every_face():
+    triangles, face_ids = closest_point.triangulate([3, 4, 5])
+
+    assert triangles.tolist() == [[0, 1, 2], [3, 4, 5], [3, 5, 6], [7, 8, 9], [7, 9, 10], [7, 10, 11]]
+    assert face_ids.tolist() == [0, 1, 1, 2, 2, 2]
+
+
+def test_triangle_index_matches_brute_force():
+    points, counts, indices = _grid_mesh()
+    index = closest_point.TriangleIndex(points, counts, indices)
+
+    rng = np.random.default_rng(1)
+    # near the surface the grid search is used, far away the queries fall back to testing every triangle
+    queries = np.concatenate([
+        rng.uniform([-0.1, -0.2, -0.1], [1.1, 0.2, 1.1], size=(300, 3)),
+        rng.uniform(-5.0, 5.0, size=(50, 3)),
+    ])
+
+    closest, triangle_ids, barycentric, distances = index.closest(queries)
+
+    corners = points[index.triangles]
+    expected_distances = np.empty(len(queries))
+    for i, query in enumerate(queries):
+        query_points = np.repeat(query[None], len(corners), axis=0)
+        reference = _reference_closest(query_points, corners[:, 0], corners[:, 1], corners[:, 2])
+        expected_distances[i] = np.linalg.norm(reference - query, axis=1).min()
+
+    assert (triangle_ids >= 0).all()
+    assert np.allclose(distances, expected_distances, atol=1e-9)
+    assert np.allclose(np.linalg.norm(closest - queries, axis=1), distances)
+    assert np.allclose(np.einsum('ij,ijk->ik', barycentric, corners[triangle_ids]), closest)
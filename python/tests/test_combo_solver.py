@@ -0,0 +1,64 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from facial_rig_toolset import combo_solver
+
+
+PRIMARIES = ("jawOpen", "smile", "wide")
+
+
+def _sculpt(primary_deltas, correctives, key):
+    '''
+    the delta the blendshape gives with the primaries of the key on: the primaries and every corrective inside it
+    '''
+    delta = sum(primary_deltas[primary] for primary in key)
+
+    return delta + sum(corrective for combo, corrective in correctives.items() if set(combo) <= set(key))
+
+
+def _known_shapes(seed, vertex_count=50):
+    rng = np.random.default_rng(seed)
+    primary_deltas = {primary: rng.normal(size=(vertex_count, 3)) for primary in PRIMARIES}
+    correctives = {
+        key: rng.normal(size=(vertex_count, 3))
+        for size in (2, 3)
+        for key in combinations(sorted(PRIMARIES), size)
+    }
+
+    return primary_deltas, correctives
+
+
+def test_solve_correctives_recovers_2_and_3_way_correctives():
+    primary_deltas, correctives = _known_shapes(0)
+    # the combos come in unsorted, the results are keyed by the sorted primaries
+    combo_deltas = {tuple(reversed(key)): _sculpt(primary_deltas, correctives, key) for key in correctives}
+
+    solved = combo_solver.solve_correctives(primary_deltas, combo_deltas)
+
+    assert set(solved) == set(correctives)
+    for key, corrective in correctives.items():
+        assert np.allclose(solved[key], corrective)
+
+
+def test_solve_corrective_points_works_on_the_shape_points():
+    primary_deltas, correctives = _known_shapes(1)
+    base = np.random.default_rng(2).normal(size=(50, 3))
+
+    solved = combo_solver.solve_corrective_points(
+        base,
+        {primary: base + delta for primary, delta in primary_deltas.items()},
+        {key: base + _sculpt(primary_deltas, correctives, key) for key in correctives}
+    )
+
+    for key, corrective in correctives.items():
+        assert np.allclose(solved[key], base + corrective)
+
+
+def test_combos_with_unknown_primaries_are_rejected():
+    with pytest.raises(ValueError):
+        combo_solver.get_combo_keys(["jawOpen"], [("jawOpen", "smile")])
+
+    with pytest.raises(ValueError):
+        combo_solver.get_combo_keys(["jawOpen", "smile"], [("jawOpen",)])
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from facial_rig_toolset import falloff_curve
+
+
+def _mel_de_boor(x, knots, control_points):
+    '''
+    SSB.deBoor from the original ssBuddy.mel, one parameter at a time
+    '''
+    p = 3
+    k = 0
+    for i in range(len(knots) - 1):
+        if knots[i] != knots[i + 1] and knots[i] <= x and knots[i + 1] >= x:
+            k = i
+
+    d = [np.array(control_points[j + k - p], dtype=np.float64) for j in range(p + 1)]
+    for r in range(1, p + 1):
+        for j in range(p, r - 1, -1):
+            alpha = (x - knots[j + k - p]) / (knots[j + 1 + k - r] - knots[j + k - p])
+            d[j] = (1.0 - alpha) * d[j - 1] + alpha * d[j]
+
+    return d[p]
+
+
+def _mel_eval_nurbs(control_points):
+    '''
+    the samples SSB.evalNurbs wrote into softSelect -ssc, as (x, y) points
+    '''
+    knots = [0.0, 0.0, 0.0]
+    i = 0
+    while i < len(control_points) - 2:
+        knots.append(float(i))
+        i += 1
+    knots += [float(i - 1)] * 3
+
+    samples = []
+    last_x = -1.0
+    max_value = knots[-1]
+    for i in range(21):
+        point = _mel_de_boor(max_value / 20.0 * i, knots, control_points)
+        if point[0] > last_x:
+            last_x = point[0]
+            samples.append(point)
+
+    return np.array(samples)
+
+
+def _control_points(count, seed):
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.random(count))
+    x[0], x[-1] = 0.0, 1.0
+
+    return np.column_stack([x, rng.random(count)])
+
+
+@pytest.mark.parametrize('count', [4, 5, 7, 9])
+def test_sample_matches_the_mel_evaluator(count):
+    control_points = _control_points(count, count)
+
+    assert np.allclose(falloff_curve.sample(control_points, use_cache=False), _mel_eval_nurbs(control_points))
+    assert np.allclose(falloff_curve.sample(control_points), _mel_eval_nurbs(control_points))
+
+
+def test_sample_drops_the_points_going_back_on_x():
+    control_points = np.array([[0.0, 1.0], [0.8, 0.9], [0.2, 0.5], [0.9, 0.2], [1.0, 0.0]])
+
+    curve_points = falloff_curve.sample(control_points)
+
+    assert np.allclose(curve_points, _mel_eval_nurbs(control_points))
+    assert (np.diff(curve_points[:, 0]) > 0).all()
+    assert not curve_points.flags.writeable
+
+
+def test_curve_string_round_trip():
+    control_points = falloff_curve.parse_curve_string("0,1,0.5,0.25,1,0,")
+
+    assert control_points.tolist() == [[0.0, 1.0], [0.5, 0.25], [1.0, 0.0]]
+    assert falloff_curve.get_ssc_string(control_points[:2]) == "1.0,0.0,1,0.25,0.5,1"
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+from facial_rig_toolset import shape_library
+from facial_rig_toolset import sparse_delta
+
+
+def _make_deltas(vertex_count=50, seed=0):
+    rng = np.random.default_rng(seed)
+    base = rng.random((vertex_count, 3))
+
+    smile = base.copy()
+    smile[:10] += rng.normal(0.0, 0.1, (10, 3))
+    wide = base.copy()
+    wide[20:45] += rng.normal(0.0, 0.1, (25, 3))
+
+    return base, {
+        "smile": sparse_delta.SparseDelta.from_points(base, smile),
+        "wide": sparse_delta.SparseDelta.from_points(base, wide),
+        "empty": sparse_delta.SparseDelta.from_points(base, base),
+    }, {"smile": smile, "wide": wide, "empty": base}
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(tmp_path, compress):
+    base, deltas, shapes = _make_deltas()
+    path = str(tmp_path / f"mouth{shape_library.EXTENSION}")
+    kinds = {"wide": shape_library.COMBO}
+    positions = {"smile": [1.0, 2.0, 3.0]}
+
+    shape_library.save_shape_library(path, deltas, kinds, positions, compress)
+    library = shape_library.ShapeLibrary(path)
+
+    assert library.names == ["smile", "wide", "empty"]
+    assert library.vertex_count == 50
+    assert library.get_kind("wide") == shape_library.COMBO
+    assert library.get_kind("smile") == shape_library.SHAPE
+    assert library.get_position("smile") == [1.0, 2.0, 3.0]
+    assert library.get_names(shape_library.COMBO) == ["wide"]
+
+    for name, points in shapes.items():
+        np.testing.assert_allclose(library.get_points(name, base), points, atol=1e-6)
+
+
+def test_compare_shape_libraries(tmp_path):
+    base, deltas, _ = _make_deltas()
+    path_a = str(tmp_path / "a.shapes")
+    path_b = str(tmp_path / "b.shapes")
+
+    shape_library.save_shape_library(path_a, deltas)
+    changed = dict(deltas)
+    del changed["empty"]
+    moved = base.copy()
+    moved[3] += [0.0, 0.5, 0.0]
+    changed["smile"] = sparse_delta.SparseDelta.from_points(base, moved)
+    changed["new"] = sparse_delta.SparseDelta.from_points(base, moved)
+    shape_library.save_shape_library(path_b, changed, compress=True)
+
+    only_a, only_b, different = shape_library.compare_shape_libraries(path_a, path_b)
+
+    assert only_a == ["empty"]
+    assert only_b == ["new"]
+    assert list(different) == ["smile"]
+
+
+def test_mixed_vertex_counts_are_rejected(tmp_path):
+    _, deltas, _ = _make_deltas(50)
+    _, other_deltas, _ = _make_deltas(60)
+    deltas["other"] = other_deltas["smile"]
+
+    with pytest.raises(ValueError):
+        shape_library.save_shape_library(str(tmp_path / "mixed.shapes"), deltas)
+
+
+@pytest.mark.parametrize("data", [b"", b"FRTSHAPE", b"NOTSHAPE" + b"\0" * 8, b"\0" * 64])
+def test_bad_files_raise_value_error(tmp_path, data):
+    path = tmp_path / "bad.shapes"
+    path.write_bytes(data)
+
+    with pytest.raises(ValueError):
+        shape_library.ShapeLibrary(str(path))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_truncated_file_raises_value_error(tmp_path, compress):
+    _, deltas, _ = _make_deltas()
+    path = tmp_path / "cut.shapes"
+    shape_library.save_shape_library(str(path), deltas, compress=compress)
+
+    data = path.read_bytes()
+    path.write_bytes(data[:len(data) - 200])
+
+    with pytest.raises(ValueError):
+        library = shape_library.ShapeLibrary(str(path))
+        library.get("wide")
@@ -0,0 +1,89 @@
+import numpy as np
+
+from facial_rig_toolset import skin_weights
+
+
+def test_get_label_other_type_uses_the_name():
+    assert skin_weights.get_label(1, skin_weights.OTHER_TYPE, "jaw") == (1, "jaw")
+
+
+def test_get_label_other_types_use_the_type():
+    assert skin_weights.get_label(2, 7, "ignored") == (2, "7")
+
+
+def test_map_influences():
+    source = [(0, "neck"), (1, "eye"), (2, "eye"), (0, "spine")]
+    target = [(2, "eye"), (0, "neck"), (1, "eye")]
+
+    np.testing.assert_array_equal(skin_weights.map_influences(source, target), [1, 2, 0, -1])
+
+
+def test_map_vertices_matches_the_closest_point():
+    rng = np.random.default_rng(0)
+    source = rng.random((500, 3))
+    order = rng.permutation(500)[:200]
+    target = source[order] + rng.normal(0.0, 1e-5, (200, 3))
+
+    np.testing.assert_array_equal(skin_weights.map_vertices(source, target), order)
+
+
+def test_map_vertices_max_distance():
+    source = np.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]])
+    target = np.array([[0.05, 0.0, 0.0], [5.0, 0.0, 0.0]])
+
+    np.testing.assert_array_equal(skin_weights.map_vertices(source, target, max_distance=0.1), [0, -1])
+
+
+def test_sparse_weights_round_trip():
+    dense = np.array([[0.5, 0.0, 0.5], [0.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    weights = skin_weights.SparseWeights.from_dense(dense)
+
+    assert weights.influences.dtype == np.int32
+    assert weights.weights.dtype == np.float32
+    np.testing.assert_allclose(weights.to_dense(), dense)
+
+
+def test_sparse_weights_limit_and_normalize():
+    dense = np.array([[0.1, 0.5, 0.3, 0.1], [0.0, 0.0, 0.0, 0.0]])
+    weights = skin_weights.SparseWeights.from_dense(dense).limit(2).normalize()
+
+    np.testing.assert_allclose(weights.to_dense(), [[0.0, 0.625, 0.375, 0.0], [0.0, 0.0, 0.0, 0.0]], rtol=1e-6)
+
+
+def test_transfer_weights_gathers_and_remaps():
+    source = skin_weights.SparseWeights.from_dense([[1.0, 0.0, 0.0], [0.0, 0.6, 0.4]])
+    target = skin_weights.SparseWeights.from_dense([[1.0, 0.0], [1.0, 0.0], [0.0, 1.0]])
+
+    # source influences 1 and 2 both land on target influence 1, 0 has no match
+    result = skin_weights.transfer_weights(source, target, [1, 0, -1], [-1, 1, 1])
+
+    # the second vertex only had the dropped influence, so it and the unmapped one keep their weights
+    np.testing.assert_allclose(result.to_dense(), [[0.0, 1.0], [1.0, 0.0], [0.0, 1.0]], rtol=1e-6)
+
+
+def test_transfer_weights_prunes_and_normalizes():
+    source = skin_weights.SparseWeights.from_dense([[0.7, 0.29995, 0.00005]])
+    target = skin_weights.SparseWeights.from_dense([[0.0, 0.0, 1.0]])
+
+    result = skin_weights.transfer_weights(source, target, [0], [0, 1, 2], threshold=0.0001)
+
+    np.testing.assert_allclose(result.to_dense(), [[0.7 / 0.99995, 0.29995 / 0.99995, 0.0]], rtol=1e-6)
+
+
+def test_get_write_entries_writes_the_non_zeros_and_the_cleared_weights():
+    weights = skin_weights.SparseWeights.from_dense([[0.0, 1.0, 0.0], [0.5, 0.0, 0.5]])
+    previous = skin_weights.SparseWeights.from_dense([[1.0, 0.0, 0.0], [0.5, 0.0, 0.5]])
+
+    rows, influences, values = skin_weights.get_write_entries(weights, previous)
+
+    assert list(zip(influences.tolist(), rows.tolist(), values.tolist())) == [
+        (0, 0, 0.0), (0, 1, 0.5), (1, 0, 1.0), (2, 1, 0.5)
+    ]
+
+
+def test_get_write_entries_without_previous_weights():
+    weights = skin_weights.SparseWeights.from_dense([[0.0, 1.0], [0.0, 0.0], [0.25, 0.75]])
+
+    rows, influences, values = skin_weights.get_write_entries(weights)
+
+    assert list(zip(influences.tolist(), rows.tolist(), values.tolist())) == [(0, 2, 0.25), (1, 0, 1.0), (1, 2, 0.75)]
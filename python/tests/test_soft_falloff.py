@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from facial_rig_toolset import soft_falloff
+
+
+def _flat_grid(size=20, spacing=0.1):
+    '''
+    a flat size x size quad grid on the xz plane
+    '''
+    x, z = np.meshgrid(np.arange(size + 1) * spacing, np.arange(size + 1) * spacing)
+    points = np.column_stack([x.ravel(), np.zeros(x.size), z.ravel()])
+
+    rows, columns = np.meshgrid(np.arange(size), np.arange(size), indexing='ij')
+    corners = rows.ravel() * (size + 1) + columns.ravel()
+    face_vertex_indices = np.column_stack([corners, corners + 1, corners + size + 2, corners + size + 1]).ravel()
+
+    return points, np.full(size * size, 4), face_vertex_indices
+
+
+def _get_adjacency(points, counts, indices):
+    return soft_falloff.get_adjacency(len(points), soft_falloff.get_edges(counts, indices))
+
+
+def test_volume_weights_follow_the_straight_line_distance():
+    points, _, _ = _flat_grid()
+    seed = 10 * 21 + 10
+    radius = 0.55
+
+    vertex_ids, weights = soft_falloff.compute_soft_weights(points, [seed], radius)
+
+    distances = np.linalg.norm(points - points[seed], axis=1)
+    expected_ids = np.flatnonzero(distances < radius)
+
+    assert sorted(vertex_ids.tolist()) == expected_ids.tolist()
+    order = np.argsort(vertex_ids)
+    assert np.allclose(weights[order], 1.0 - distances[expected_ids] / radius, atol=1e-6)
+
+
+def test_surface_and_volume_agree_along_the_grid_lines():
+    points, counts, indices = _flat_grid()
+    seed = 10 * 21 + 10
+    radius = 0.55
+
+    volume = dict(zip(*soft_falloff.compute_soft_weights(points, [seed], radius, soft_falloff.VOLUME)))
+    surface = dict(zip(*soft_falloff.compute_soft_weights(
+        points, [seed], radius, soft_falloff.SURFACE, adjacency=_get_adjacency(points, counts, indices)
+    )))
+
+    # the path along the edges is never shorter than the straight line
+    assert set(surface) <= set(volume)
+    assert all(surface[vertex] <= volume[vertex] + 1e-6 for vertex in surface)
+
+    # on the row and the column of the seed both distances are the same
+    on_lines = [vertex for vertex in volume if vertex // 21 == 10 or vertex % 21 == 10]
+    assert len(on_lines) == 21
+    assert np.allclose([surface[vertex] for vertex in on_lines], [volume[vertex] for vertex in on_lines], atol=1e-6)
+
+
+def test_surface_falloff_doesnt_jump_across_a_gap():
+    points, counts, indices = _flat_grid()
+    # a second sheet right above the first one, not connected to it
+    upper_points = points + [0.0, 0.05, 0.0]
+    all_points = np.concatenate([points, upper_points])
+    all_indices = np.concatenate([indices, indices + len(points)])
+    all_counts = np.concatenate([counts, counts])
+    seed = 10 * 21 + 10
+
+    volume_ids, _ = soft_falloff.compute_soft_weights(all_points, [seed], 0.3, soft_falloff.VOLUME)
+    surface_ids, _ = soft_falloff.compute_soft_weights(
+        all_points, [seed], 0.3, soft_falloff.SURFACE, adjacency=_get_adjacency(all_points, all_counts, all_indices)
+    )
+
+    assert (volume_ids >= len(points)).any()
+    assert (surface_ids < len(points)).all()
+
+
+def test_bad_falloff_settings_are_rejected():
+    points, _, _ = _flat_grid(2)
+
+    with pytest.raises(ValueError):
+        soft_falloff.compute_soft_weights(points, [0], 0.0)
+
+    with pytest.raises(ValueError):
+        soft_falloff.compute_soft_weights(points, [0], 1.0, soft_falloff.SURFACE)
+
+    with pytest.raises(ValueError):
+        soft_falloff.compute_soft_weights(points, [0], 1.0, "geodesic")
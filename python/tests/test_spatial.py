@@ -0,0 +1,87 @@
+import numpy as np
+
+from facial_rig_toolset import spatial
+
+
+def _brute_force_pairs(points, queries, radius):
+    distances = np.linalg.norm(queries[:, None] - points[None], axis=2)
+    query_ids, point_ids = np.nonzero(distances <= radius)
+
+    return set(zip(query_ids.tolist(), point_ids.tolist()))
+
+
+def test_query_pairs_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points = rng.random((400, 3))
+    queries = rng.random((100, 3))
+
+    query_ids, point_ids, _ = spatial.SpatialGrid(points, 0.1).query_pairs(queries)
+
+    assert set(zip(query_ids.tolist(), point_ids.tolist())) == _brute_force_pairs(points, queries, 0.1)
+
+
+def test_query_pairs_across_cell_edges():
+    # the points sit right next to the cell borders, on both sides and across negative coordinates
+    cell_size = 0.5
+    points = np.array([
+        [0.499999, 0.0, 0.0],
+        [-0.000001, 0.0, 0.0],
+        [-0.5, -0.5, -0.5],
+        [1.0, 1.0, 1.0],
+    ])
+    queries = np.array([
+        [0.500001, 0.0, 0.0],
+        [0.000001, 0.0, 0.0],
+        [-0.500001, -0.499999, -0.5],
+        [0.999999, 1.000001, 1.0],
+    ])
+
+    query_ids, point_ids, _ = spatial.SpatialGrid(points, cell_size).query_pairs(queries, 0.001)
+
+    assert set(zip(query_ids.tolist(), point_ids.tolist())) == {(0, 0), (1, 1), (2, 2), (3, 3)}
+
+
+def test_radius_bigger_than_the_cell_is_rejected():
+    grid = spatial.SpatialGrid(np.zeros((1, 3)), 0.1)
+
+    try:
+        grid.query_pairs(np.zeros((1, 3)), 0.2)
+    except ValueError:
+        return
+    assert False, "the radius should be checked"
+
+
+def test_assign_pairs_is_one_to_one():
+    rng = np.random.default_rng(1)
+    rows = rng.integers(0, 30, 500)
+    cols = rng.integers(0, 30, 500)
+    distances = rng.random(500)
+
+    accepted_rows, accepted_cols = spatial.assign_pairs(rows, cols, distances)
+
+    assert len(np.unique(accepted_rows)) == len(accepted_rows)
+    assert len(np.unique(accepted_cols)) == len(accepted_cols)
+    # every accepted pair is a candidate
+    candidates = set(zip(rows.tolist(), cols.tolist()))
+    assert all(pair in candidates for pair in zip(accepted_rows.tolist(), accepted_cols.tolist()))
+    # nothing is left that could still be paired
+    free = ~np.isin(rows, accepted_rows) & ~np.isin(cols, accepted_cols)
+    assert not free.any()
+
+
+def test_assign_pairs_closest_wins():
+    rows, cols = spatial.assign_pairs([0, 0, 1], [0, 1, 0], [0.1, 0.2, 0.05])
+
+    assert sorted(zip(rows.tolist(), cols.tolist())) == [(0, 1), (1, 0)]
+
+
+def test_find_nearest_matches_brute_force():
+    rng = np.random.default_rng(2)
+    points = rng.random((300, 3))
+    queries = rng.random((50, 3)) * 4.0 - 2.0
+
+    ids, distances = spatial.find_nearest(points, queries)
+
+    brute_force = np.linalg.norm(queries[:, None] - points[None], axis=2)
+    np.testing.assert_array_equal(ids, brute_force.argmin(axis=1))
+    np.testing.assert_allclose(distances, brute_force.min(axis=1))
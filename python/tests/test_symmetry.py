@@ -0,0 +1,100 @@
+import numpy as np
+
+from facial_rig_toolset import symmetry
+
+
+def _mirrored_cloud(count=300, axis=0, seed=0):
+    '''
+    random points on the positive side, their reflections and a few points on the mirror plane
+    '''
+    rng = np.random.default_rng(seed)
+    positive = rng.random((count, 3))
+    positive[:, axis] += 0.1
+
+    negative = positive.copy()
+    negative[:, axis] *= -1.0
+
+    middle = rng.random((5, 3))
+    middle[:, axis] = 0.0
+
+    points = np.vstack([positive, negative, middle])
+    order = rng.permutation(len(points))
+
+    return points[order], np.argsort(order)
+
+
+def test_mirrored_cloud_is_symmetrical():
+    for axis in range(3):
+        points, original = _mirrored_cloud(axis=axis, seed=axis)
+
+        table, non_symmetric = symmetry.build_symmetry_table(points, axis, mid=0.0)
+
+        assert len(table) == 300
+        assert len(non_symmetric) == 0
+        np.testing.assert_allclose(symmetry.mirror_points(points[table[:, 1]], axis), points[table[:, 0]])
+        # every original pair is found
+        pairs = set(map(tuple, table.tolist()))
+        assert all((original[i], original[i + 300]) in pairs for i in range(300))
+
+
+def test_table_is_sorted_by_positive_vertex():
+    points, _ = _mirrored_cloud()
+
+    table, _ = symmetry.build_symmetry_table(points, mid=0.0)
+
+    assert np.all(np.diff(table[:, 0]) > 0)
+
+
+def test_unmatched_vertices():
+    points, _ = _mirrored_cloud(count=50)
+    moved = np.flatnonzero(points[:, 0] < -0.2)[:3]
+    points[moved, 1] += 0.5
+
+    table, non_symmetric = symmetry.build_symmetry_table(points, mid=0.0)
+
+    assert len(table) == 47
+    assert set(moved.tolist()) <= set(non_symmetric.tolist())
+    assert len(non_symmetric) == 6
+    # the positive vertices come first like in abCheckSym
+    sides = symmetry.get_sides(points, mid=0.0)
+    assert np.all(sides[non_symmetric[:3]] == symmetry.SIDE_POSITIVE)
+    assert np.all(sides[non_symmetric[3:]] == symmetry.SIDE_NEGATIVE)
+
+
+def test_symmetry_map_round_trip():
+    points, _ = _mirrored_cloud(count=100)
+
+    symmetry_map = symmetry.SymmetryMap.from_points(points, mid=0.0)
+    paired = symmetry_map.mirror >= 0
+
+    np.testing.assert_array_equal(symmetry_map.mirror[symmetry_map.mirror[paired]], np.flatnonzero(paired))
+    assert np.all(symmetry_map.sides[symmetry_map.middle] == symmetry.SIDE_MIDDLE)
+
+
+def test_symmetrize_points_snaps_the_negative_side():
+    rng = np.random.default_rng(3)
+    positive = rng.random((200, 3)) + [0.1, 0.0, 0.0]
+    negative = positive * [-1.0, 1.0, 1.0] + rng.normal(0.0, 0.002, (200, 3))
+    points = np.vstack([positive, negative])
+
+    new_points, matched_positive, matched_negative = symmetry.symmetrize_points(points, end_tolerance=0.05)
+
+    assert len(matched_negative) == 200
+    np.testing.assert_allclose(new_points[matched_negative], symmetry.mirror_points(points[matched_positive]))
+    np.testing.assert_array_equal(new_points[:200], positive)
+
+
+def test_mirror_shape_points_around_the_map_mid():
+    points, _ = _mirrored_cloud(count=100)
+    points[:, 0] += 2.5
+
+    symmetry_map = symmetry.SymmetryMap.from_points(points)
+    assert symmetry_map.mid == 2.5
+
+    shape = points.copy()
+    positive = np.flatnonzero(symmetry_map.sides == symmetry.SIDE_POSITIVE)
+    shape[positive] += [0.1, 0.2, 0.0]
+
+    mirrored = symmetry.mirror_shape_points(shape, symmetry_map, mid=symmetry_map.mid)
+
+    np.testing.assert_allclose(mirrored[symmetry_map.mirror[positive]], symmetry.mirror_points(shape[positive], 0, 2.5))